@@ -0,0 +1,182 @@
+"""爬虫任务的通用数据库操作.
+
+Jira 与 KMS 任务共用 tasks 表，仅以 task_mode 区分，查询与状态更新逻辑在此统一实现。
+"""
+
+import os
+import time
+from datetime import datetime
+from typing import Any, Optional, Union
+from uuid import UUID
+
+from sqlalchemy import and_, bindparam, or_
+from sqlmodel import Session, col, select, update
+from sqlmodel.sql.expression import SelectOfScalar
+
+from api.database.models import DifyTask, Task
+
+# extra_data 中记录任务归属进程的键：创建任务的 API 进程，以及任务启动的子进程
+OWNER_PID_KEY = "owner_pid"
+PROCESS_PID_KEY = "pid"
+
+# 预先构建的按ID和任务模式查询语句，各次调用只替换绑定参数
+_TASK_BY_ID = select(Task).where(
+    Task.id == bindparam("task_id"), Task.task_mode == bindparam("task_mode")
+)
+
+
+def get_task_by_id(task_id: UUID, task_mode: str, db: Session) -> Optional[Task]:
+    """根据ID获取指定模式的爬虫任务，任务模式条件直接下推到 SQL."""
+    return db.exec(_TASK_BY_ID, params={"task_id": task_id, "task_mode": task_mode}).first()
+
+
+def update_task_status(
+    task: Task,
+    status: str,
+    message: Optional[str] = None,
+    error: Optional[str] = None,
+    db: Session = None,
+    refresh: bool = False,
+    **kwargs,
+) -> Task:
+    """更新爬虫任务状态.
+
+    默认提交后不再 refresh，调用方需要立即读取最新字段时传入 refresh=True。
+    """
+    task.status = status
+    task.message = message
+    task.error = error
+
+    if status in ["completed", "failed"]:
+        task.end_time = time.time()
+        if task.start_time:
+            task.duration_seconds = task.end_time - task.start_time
+
+    # 更新其他属性
+    for key, value in kwargs.items():
+        if hasattr(task, key):
+            setattr(task, key, value)
+
+    if db:
+        db.commit()
+        if refresh:
+            db.refresh(task)
+    return task
+
+
+def complete_task(task_id: UUID, task_mode: str, db: Session, message: str = "任务已完成") -> bool:
+    """直接以 UPDATE 语句将任务标记为完成，不加载任务对象.
+
+    已标记为失败的任务不会被回调改回完成，失败状态由爬虫退出码或重启清理写入，以其为准。
+
+    Returns:
+        bool: 任务存在时返回 True，包括已失败而未被更新的任务
+    """
+    end_time = time.time()
+    result = db.exec(
+        update(Task)
+        .where(Task.id == task_id, Task.task_mode == task_mode, Task.status != "failed")
+        .values(
+            status="completed",
+            message=message,
+            error=None,
+            end_time=end_time,
+            duration_seconds=end_time - Task.start_time,
+        )
+    )
+    db.commit()
+    if result.rowcount > 0:
+        return True
+    return get_task_by_id(task_id, task_mode, db) is not None
+
+
+def set_task_pid(task: Union[Task, DifyTask], pid: int, db: Session) -> None:
+    """在 extra_data 中记录任务子进程的 PID，服务重启后据此判断任务是否仍在运行."""
+    # JSON 列需要整体赋值才会被识别为已修改
+    task.extra_data = {**(task.extra_data or {}), PROCESS_PID_KEY: pid}
+    db.commit()
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    """判断进程是否仍然存在."""
+    if not pid:
+        return False
+    if os.name == "nt":
+        # Windows 上 os.kill 会直接结束目标进程，改为尝试打开进程句柄
+        import ctypes
+
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def fail_orphaned_tasks(db: Session, started_before: float) -> int:
+    """将已无进程负责的 pending/running 任务标记为失败.
+
+    爬虫以子进程运行，API 进程重载或多进程部署时子进程仍会继续执行并回调，
+    因此只处理 started_before 之前创建、且创建它的 API 进程和启动的子进程都已不存在的任务。
+
+    Returns:
+        int: 标记为失败的任务数
+    """
+    failed = 0
+    for model in (Task, DifyTask):
+        rows = db.exec(
+            select(model.id, model.extra_data).where(
+                col(model.status).in_(("pending", "running")), model.start_time < started_before
+            )
+        ).all()
+        orphaned = [
+            task_id
+            for task_id, extra in rows
+            if not any(
+                _pid_alive((extra or {}).get(key)) for key in (OWNER_PID_KEY, PROCESS_PID_KEY)
+            )
+        ]
+        if not orphaned:
+            continue
+        # 状态条件再检查一次，避免覆盖查询之后刚刚完成的任务
+        result = db.exec(
+            update(model)
+            .where(col(model.id).in_(orphaned), col(model.status).in_(("pending", "running")))
+            .values(status="failed", message="服务重启，任务已中断", end_time=time.time())
+        )
+        failed += result.rowcount
+    db.commit()
+    return failed
+
+
+def paginate_by_created(
+    query: SelectOfScalar,
+    created_at: Any,
+    id_col: Any,
+    skip: int,
+    limit: int,
+    cursor: Optional[datetime] = None,
+    cursor_id: Optional[UUID] = None,
+) -> SelectOfScalar:
+    """按创建时间倒序分页，创建时间相同的记录再按ID倒序.
+
+    提供游标(上一页最后一条的创建时间和ID)时使用 keyset 分页，直接从索引定位，
+    不再扫描并丢弃 offset 之前的记录。游标包含ID，创建时间相同的记录跨页时不会被跳过；
+    只传创建时间时按旧游标处理，跳过与其创建时间相同的全部记录。
+    """
+    if cursor is not None:
+        if cursor_id is not None:
+            query = query.where(
+                or_(created_at < cursor, and_(created_at == cursor, id_col < cursor_id))
+            )
+        else:
+            query = query.where(created_at < cursor)
+    else:
+        query = query.offset(skip)
+    return query.order_by(created_at.desc(), id_col.desc()).limit(limit)
@@ -3,6 +3,7 @@ import os
 from contextlib import contextmanager
 from typing import Generator
 
+from sqlalchemy import event, text
 from sqlmodel import Session, SQLModel, create_engine
 
 # 获取当前文件所在目录
@@ -11,13 +12,45 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # 数据库文件路径
 DB_PATH = os.path.join(BASE_DIR, "api.db")
 
+# 分页排序加入 id 后不再使用的旧索引，初始化时删除
+_LEGACY_INDEXES = (
+    "ix_tasks_mode_status_created",
+    "ix_tasks_mode_created",
+    "ix_dify_tasks_status_created",
+    "ix_dify_tasks_created",
+)
+
+# 连接池配置，可通过环境变量调整，避免后台爬虫任务的会话挤占请求处理的连接
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "5"))  # 获取连接超时(秒)，快速失败而不是长时间挂起
+
 # 创建数据库引擎
 engine = create_engine(
     f"sqlite:///{DB_PATH}",
     connect_args={"check_same_thread": False},  # 允许多线程访问
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
     echo=False  # 设置为True可以查看SQL语句
 )
 
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, _connection_record) -> None:
+    """为每个新建的 SQLite 连接开启 WAL 模式.
+
+    WAL 模式下读写互不阻塞，synchronous=NORMAL 仅在检查点时刷盘，
+    大幅降低任务状态频繁更新时每次提交的 fsync 开销。
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256MB
+    cursor.close()
+
+
 # 创建会话工厂
 SessionLocal = Session
 
@@ -55,7 +88,17 @@ def get_db_context() -> Generator[Session, None, None]:
 def init_db() -> None:
     """初始化数据库."""
     # SQLModel会自动导入所有继承自SQLModel的模型
-    from api.database.models import ApiLog, Task  # noqa: F401
+    from api.database.models import ApiLog, DifyTask, Task  # noqa: F401
 
     # 创建所有表
     SQLModel.metadata.create_all(engine)
+
+    # create_all 不会为已存在的表补建索引，这里单独检查创建
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+    # 删除已被包含 id 的分页索引取代的旧索引
+    with engine.begin() as conn:
+        for name in _LEGACY_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
@@ -4,8 +4,9 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 from uuid import UUID
 
+from pydantic import ConfigDict
 from sqlmodel import Field, SQLModel
-from sqlalchemy import JSON, Column
+from sqlalchemy import JSON, Column, Index
 
 
 class ApiLog(SQLModel, table=True):
@@ -31,6 +32,12 @@ class Task(SQLModel, table=True):
     """爬虫任务模型."""
 
     __tablename__ = "tasks"
+    # 覆盖按模式/状态筛选并按 (创建时间, ID) 倒序分页的列表查询及其 COUNT；
+    # 不带状态筛选时由 (task_mode, created_at, id) 直接提供排序，避免临时 B 树排序
+    __table_args__ = (
+        Index("ix_tasks_mode_status_created_id", "task_mode", "status", "created_at", "id"),
+        Index("ix_tasks_mode_created_id", "task_mode", "created_at", "id"),
+    )
 
     id: UUID = Field(..., primary_key=True, description="任务ID")
     task_mode: str = Field(default="jira", description="任务模式(jira/kms)")
@@ -59,16 +66,18 @@ class Task(SQLModel, table=True):
         default=None, sa_column=Column(JSON), description="额外数据"
     )
 
-    class Config:
-        """模型配置."""
-
-        json_encoders = {datetime: lambda v: v.isoformat() if v else None}
+    model_config = ConfigDict(json_encoders={datetime: lambda v: v.isoformat() if v else None})
 
 
 class DifyTask(SQLModel, table=True):
     """Dify 知识库导入任务模型."""
 
     __tablename__ = "dify_tasks"
+    # 覆盖按状态筛选/不筛选时按 (创建时间, ID) 倒序分页的列表查询
+    __table_args__ = (
+        Index("ix_dify_tasks_status_created_id", "status", "created_at", "id"),
+        Index("ix_dify_tasks_created_id", "created_at", "id"),
+    )
 
     id: UUID = Field(..., primary_key=True, description="任务ID")
     status: str = Field(default="pending", description="任务状态(pending/running/completed/failed)")
@@ -94,7 +103,4 @@ class DifyTask(SQLModel, table=True):
         default=None, sa_column=Column(JSON), description="额外数据"
     )
 
-    class Config:
-        """模型配置."""
-
-        json_encoders = {datetime: lambda v: v.isoformat() if v else None}
+    model_config = ConfigDict(json_encoders={datetime: lambda v: v.isoformat() if v else None})
@@ -4,35 +4,35 @@ import logging
 from logging.handlers import RotatingFileHandler
 import os
 import shutil
-from datetime import datetime
+import time
 from dotenv import load_dotenv
 
-from fastapi import FastAPI, Depends, Query
+# 载入环境变量，需在导入各业务模块之前完成，它们在导入时读取配置
+load_dotenv()
+
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
-from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, Response
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, ORJSONResponse, Response
 import yaml
 import json
 
 from contextlib import asynccontextmanager
 
 from api.router.api_service import router as jira_router, TEMP_DIR
-from api.router.api_kms_service import router as kms_router
+from api.router.api_kms_service import router as kms_router, remove_crawler_logs
 from api.router.common import router as common_router
 from api.router.dify_service import router as dify_router
-from sqlmodel import Session, select
+from sqlmodel import Session, delete, select
 
 from api.database.models import Task, DifyTask
 from api.middleware import APILoggingMiddleware, BearerTokenMiddleware
-from api.database.db import get_db, init_db, engine
-
-# 载入环境变量
-load_dotenv()
+from api.database.crud import fail_orphaned_tasks
+from api.database.db import init_db, engine
 
 # 从环境变量获取API根路径，默认为空字符串
 API_ROOT_PATH = os.getenv("API_ROOT_PATH", "")
-API_ROOT_PORT = os.getenv("API_ROOT_PORT", "8000")
-API_ROOT_PORT = int(API_ROOT_PORT)
+API_ROOT_PORT = int(os.getenv("API_ROOT_PORT", "8000"))
 
 # 配置日志
 log_dir = "logs-api"
@@ -52,9 +52,9 @@ file_handler.setFormatter(
     )
 )
 
-# 配置根日志记录器
+# 配置根日志记录器，默认 INFO，可通过 LOG_LEVEL 环境变量调整
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
     handlers=[
         file_handler,  # 输出到轮换文件
     ],
@@ -63,6 +63,10 @@ logging.basicConfig(
 # 使用uvicorn的日志记录器
 logger = logging.getLogger("uvicorn")
 
+# 定期清理的执行间隔与任务数据保留时长(秒)
+SEVEN_DAYS = 7 * 86400
+TASK_RETENTION_SECONDS = 28 * 86400
+
 # 自定义 uvicorn 日志格式
 log_config = {
     "version": 1,
@@ -106,53 +110,57 @@ async def periodic_cleanup():
         try:
             # 创建新的数据库会话
             with Session(engine) as db:
-                await cleanup_old_tasks(db=db)
-                await cleanup_old_dify_tasks(db=db)
+                await cleanup_old_all(db=db)
                 logger.info("已完成定期清理任务")
         except Exception as e:
-            logger.error(f"定期清理任务失败: {str(e)}")
+            logger.error("定期清理任务失败: %s", e)
 
         # 每7天执行一次
-        await asyncio.sleep(86400 * 7)
+        await asyncio.sleep(SEVEN_DAYS)
 
 
-async def cleanup_old_tasks(db: Session = Depends(get_db)) -> None:
-    """清理超过28天的任务数据."""
-    cutoff_time = datetime.now().timestamp() - 86400 * 28  # 28天
-    query = select(Task).where(Task.start_time < cutoff_time)
-    old_tasks = db.exec(query).all()
+async def cleanup_old_all(db: Session) -> None:
+    """清理超过28天的爬虫任务和Dify任务数据.
 
-    for task in old_tasks:
-        task_dir = os.path.join(TEMP_DIR, str(task.id))
-        if os.path.exists(task_dir):
-            shutil.rmtree(task_dir)
-        db.delete(task)
+    先收集两类任务的目录并发删除，再在同一个事务中批量删除数据库记录。
+    """
+    cutoff_time = time.time() - TASK_RETENTION_SECONDS
 
-    db.commit()
+    task_ids = db.exec(select(Task.id).where(Task.start_time < cutoff_time)).all()
+    dify_dirs = db.exec(select(DifyTask.input_dir).where(DifyTask.start_time < cutoff_time)).all()
 
+    # Dify 任务的输入目录可能就是爬虫任务目录，去重后再删除
+    task_dirs = dict.fromkeys(
+        [str(TEMP_DIR / str(task_id)) for task_id in task_ids] + list(dify_dirs)
+    )
+    # ignore_errors 在目录不存在时静默跳过，省去 exists 检查并避免检查与删除之间的竞态
+    await asyncio.gather(
+        *(asyncio.to_thread(shutil.rmtree, d, ignore_errors=True) for d in task_dirs),
+        *(asyncio.to_thread(remove_crawler_logs, task_id) for task_id in task_ids),
+    )
+
+    db.exec(delete(Task).where(Task.start_time < cutoff_time))
+    db.exec(delete(DifyTask).where(DifyTask.start_time < cutoff_time))
+    db.commit()
 
-async def cleanup_old_dify_tasks(db: Session = Depends(get_db)) -> None:
-    """清理超过28天的Dify任务上传数据记录."""
-    cutoff_time = datetime.now().timestamp() - 86400 * 28 # 28天
-    query = select(DifyTask).where(DifyTask.start_time < cutoff_time)
-    old_tasks = db.exec(query).all()
 
-    for task in old_tasks:
-        task_dir = task.input_dir
-        if os.path.exists(task_dir) and os.path.isdir(task_dir):
-            try:
-                shutil.rmtree(task_dir)
-                logger.info(f"Deleted old Dify task directory: {task_dir}")
-            except Exception as e:
-                logger.error(f"Failed to delete Dify task directory: {e}")
-        db.delete(task)
+def fail_interrupted_tasks() -> None:
+    """将上次运行遗留、已无进程负责的任务标记为失败.
 
-    db.commit()
+    只在服务启动时执行一次(不在每个 worker 的 lifespan 中执行)，
+    仍在运行的爬虫子进程对应的任务不受影响，完成后照常回调。
+    """
+    with Session(engine) as db:
+        failed = fail_orphaned_tasks(db, time.time())
+    if failed:
+        logger.info("已将 %d 个中断的任务标记为失败", failed)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动时执行
+    # 预先生成并缓存 OpenAPI 文档，避免首次访问文档时才组装 schema
+    app.openapi_schema = app.openapi()
     cleanup_task = asyncio.create_task(periodic_cleanup())
     logger.info("启动定期清理任务")
 
@@ -209,6 +217,7 @@ app = FastAPI(
     """,
     lifespan=lifespan,
     version="1.0.0",
+    default_response_class=ORJSONResponse,  # 使用 orjson 序列化 JSON 响应
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
@@ -302,14 +311,23 @@ link_doc = f"\033[1m{base_url}/api/docs\033[0m"
 link_redoc = f"\033[1m{base_url}/api/redoc\033[0m"
 link_openapi_yaml = f"\033[1m{base_url}/api/openapi.yaml\033[0m"
 link_openapi_yaml_view = f"\033[1m{base_url}/api/openapi.yaml/view\033[0m"
-logger.info(f"访问API文档: {link_doc}")
-logger.info(f"访问API文档: {link_redoc}")
-logger.info(f"访问YAML格式OpenAPI文档: {link_openapi_yaml}")
-logger.info(f"访问浏览器友好的YAML查看选项: {link_openapi_yaml_view}")
+logger.info("访问API文档: %s", link_doc)
+logger.info("访问API文档: %s", link_redoc)
+logger.info("访问YAML格式OpenAPI文档: %s", link_openapi_yaml)
+logger.info("访问浏览器友好的YAML查看选项: %s", link_openapi_yaml_view)
 
 # 默认8000端口，支持外部端口号定义
 if __name__ == "__main__":
+    # 启用 reload 时 worker 会反复重启，遗留任务只在主进程启动时清理一次
+    fail_interrupted_tasks()
+
     # 启动 uvicorn 服务器，使用自定义日志配置
+    # loop="auto" 在安装了 uvloop 时使用 uvloop 事件循环（Windows 下回退到 asyncio）
     uvicorn.run(
-        "api.main:app", host="0.0.0.0", port=API_ROOT_PORT, reload=True, log_config=log_config
+        "api.main:app",
+        host="0.0.0.0",
+        port=API_ROOT_PORT,
+        reload=True,
+        log_config=log_config,
+        loop="auto",
     )
@@ -4,6 +4,7 @@
 支持配置白名单路径，这些路径不需要进行 Token 验证。
 """
 
+import hmac
 import os
 from typing import Callable, List, Optional
 
@@ -44,6 +45,10 @@ class BearerTokenMiddleware(BaseHTTPMiddleware):
             "/api/jira/callback",
             "/api/kms/callback",
         ]
+        # 白名单路径本身精确匹配，其子路径只在路径段边界处匹配，/api/docsX 不会被放行；
+        # str.startswith 接受元组，一次 C 层调用即可完成所有前缀匹配
+        self._exact_paths = frozenset(self.whitelist_paths) | {"/"}
+        self._prefix_tuple = tuple(p.rstrip("/") + "/" for p in self.whitelist_paths)
 
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         """处理请求并验证 Bearer Token.
@@ -51,24 +56,21 @@ class BearerTokenMiddleware(BaseHTTPMiddleware):
         如果请求路径在白名单中，或者请求头中包含有效的 Bearer Token，
         则允许请求继续处理；否则返回 401 未授权错误。
         """
-        # 检查路径是否在白名单中
+        # 检查路径是否在白名单中，去掉部署时的根路径前缀后再匹配
         path = request.url.path
+        root_path = request.scope.get("root_path", "")
+        if root_path and (path == root_path or path.startswith(root_path.rstrip("/") + "/")):
+            path = path[len(root_path.rstrip("/")) :] or "/"
 
         # --- 在这里加入对 OPTIONS 的判断 ---
         if request.method == "OPTIONS":
             # 如果是 OPTIONS 请求，直接调用下一个中间件/路由，不进行认证
             return await call_next(request)
 
-        # 精确匹配根路径
-        if path == "/":
+        # 精确匹配根路径和白名单路径，或位于白名单路径之下
+        if path in self._exact_paths or path.startswith(self._prefix_tuple):
             return await call_next(request)
 
-        # 对于其他路径，使用更精确的匹配规则
-        for wp in self.whitelist_paths:
-            # 精确匹配完整路径 或包 含在白名单路径中
-            if path == wp or wp in path:
-                return await call_next(request)
-
         # 获取并验证 Authorization 头
         auth_header = request.headers.get("Authorization")
         if not auth_header:
@@ -78,16 +80,16 @@ class BearerTokenMiddleware(BaseHTTPMiddleware):
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        # 验证 token 格式和值
-        parts = auth_header.split()
-        if len(parts) != 2 or parts[0].lower() != "bearer":
+        # 验证 token 格式和值，partition 只扫描到第一个空格，不分配列表
+        scheme, sep, token = auth_header.partition(" ")
+        if not sep or scheme.lower() != "bearer" or not token or " " in token:
             return JSONResponse(
                 status_code=HTTP_401_UNAUTHORIZED,
                 content={"detail": "认证令牌格式无效"},
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        if parts[1] != self.token:
+        if not hmac.compare_digest(token.encode(), self.token.encode()):
             return JSONResponse(
                 status_code=HTTP_401_UNAUTHORIZED,
                 content={"detail": "认证令牌无效"},
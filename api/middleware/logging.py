@@ -10,6 +10,32 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from api.database.models import ApiLog
 from api.database.db import get_db_context
 
+# 二进制响应的内容类型，这类响应不缓冲、不记录响应内容
+BINARY_CONTENT_TYPES = (
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/octet-stream",
+    "image/",
+    "audio/",
+    "video/",
+)
+
+
+def is_file_response(response: Response) -> bool:
+    """判断响应是否为文件下载.
+
+    BaseHTTPMiddleware 的 call_next 返回的是包装后的流式响应，
+    不会是 FileResponse 实例，因此同时根据响应头判断。
+    """
+    if isinstance(response, FileResponse):
+        return True
+    if "attachment" in response.headers.get("content-disposition", ""):
+        return True
+    content_type = response.headers.get("content-type", "").lower()
+    return any(binary_type in content_type for binary_type in BINARY_CONTENT_TYPES)
+
+
 class APILoggingMiddleware(BaseHTTPMiddleware):
     """API请求日志记录中间件."""
 
@@ -20,11 +46,16 @@ class APILoggingMiddleware(BaseHTTPMiddleware):
         # 记录开始时间
         start_time = time.time()
 
-        # 准备记录请求信息
+        # 准备记录请求信息，直接读取 ASGI scope 中的原始值，避免构建 Headers 对象
+        scope = request.scope
         path = request.url.path
-        method = request.method
-        client_ip = request.client.host
-        user_agent = request.headers.get("user-agent")
+        method = scope["method"]
+        client = scope.get("client")
+        client_ip = client[0] if client else ""
+        user_agent = next(
+            (value.decode("latin-1") for key, value in scope["headers"] if key == b"user-agent"),
+            None,
+        )
 
         # 获取请求参数
         params = dict(request.query_params)
@@ -37,14 +68,15 @@ class APILoggingMiddleware(BaseHTTPMiddleware):
             body_str = None
 
         response = None
+        response_body = b""
         error_message = None
 
         try:
             # 处理请求
             response = await call_next(request)
 
-            # 检查是否是文件响应
-            if isinstance(response, FileResponse):
+            # 检查是否是文件响应，文件下载直接透传，避免把整个文件读入内存
+            if is_file_response(response):
                 # 如果是文件下载，直接返回响应
                 duration = int((time.time() - start_time) * 1000)
                 with get_db_context() as db:
@@ -64,9 +96,10 @@ class APILoggingMiddleware(BaseHTTPMiddleware):
                 return response
 
             # 处理普通响应
-            response_body = b""
+            chunks = []
             async for chunk in response.body_iterator:
-                response_body += chunk
+                chunks.append(chunk)
+            response_body = b"".join(chunks)
 
             # 重新构建响应
             return Response(
@@ -81,7 +114,7 @@ class APILoggingMiddleware(BaseHTTPMiddleware):
             raise
 
         finally:
-            if not isinstance(response, FileResponse):  # 只对非文件响应记录完整日志
+            if response is None or not is_file_response(response):  # 只对非文件响应记录完整日志
                 # 计算处理时长
                 duration = int((time.time() - start_time) * 1000)
 
@@ -92,10 +125,7 @@ class APILoggingMiddleware(BaseHTTPMiddleware):
                         response_content = None
                         if response and response_body:
                             content_type = response.headers.get("content-type", "")
-                            if any(binary_type in content_type.lower() for binary_type in [
-                                "application/zip", "application/gzip", "application/x-gzip", 
-                                "application/octet-stream", "image/", "audio/", "video/"
-                            ]):
+                            if any(binary_type in content_type.lower() for binary_type in BINARY_CONTENT_TYPES):
                                 # 二进制内容，不尝试解码
                                 response_content = "[Binary Content]"
                             else:
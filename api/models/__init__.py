@@ -1,12 +1,32 @@
-"""API模型包."""
-
-from api.models.request import CrawlRequest
-from api.models.response import TaskStatus, TaskResponse, TaskList, BinaryFileSchema
-
-__all__ = [
-    "CrawlRequest",
-    "TaskStatus",
-    "TaskResponse",
-    "TaskList",
-    "BinaryFileSchema",
-]
+"""API模型包.
+
+模型按需导入（PEP 562），导入 api.models.request 时不会连带构建响应模型的 schema。
+"""
+
+import importlib
+from typing import Any
+
+_MODEL_MODULES = {
+    "CrawlRequest": "api.models.request",
+    "CrawlKMSRequest": "api.models.request",
+    "DifyUploadRequest": "api.models.request",
+    "JiraITOPSRequest": "api.models.request",
+    "TaskStatus": "api.models.response",
+    "TaskResponse": "api.models.response",
+    "TaskList": "api.models.response",
+    "TaskListBase": "api.models.response",
+    "DifyTaskStatus": "api.models.response",
+    "DifyTaskResponse": "api.models.response",
+    "DifyTaskList": "api.models.response",
+    "JiraITOPSResponse": "api.models.response",
+}
+
+__all__ = list(_MODEL_MODULES)
+
+
+def __getattr__(name: str) -> Any:
+    """首次访问时才导入模型所在模块."""
+    module_name = _MODEL_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
@@ -1,14 +1,52 @@
 """请求模型定义."""
 
-from pydantic import BaseModel, Field
+import os
 
+from pydantic import BaseModel, ConfigDict, Field
 
-# 载入环境变量
-load_dotenv()
 
-# 从环境变量获取API根路径，默认为空字符串
+# 从环境变量获取API根路径，环境变量由 api.main 启动时统一载入，默认为空字符串
 DIFY_BASE_URL = os.getenv("DIFY_BASE_URL", "https://poc.new-see.com:88/v1")
 
+# 接口文档示例，模块级常量只构建一次
+_CRAWL_REQUEST_EXAMPLE = {
+    "example": {
+        "page_size": 500,
+        "start_at": 0,
+        "description_limit": 400,
+        "comments_limit": 10,
+        "jql": "assignee = currentUser() AND resolution = Unresolved order by updated DESC",
+    }
+}
+
+_CRAWL_KMS_REQUEST_EXAMPLE = {
+    "example": {
+        "start_url": "http://kms.new-see.com:8090/pages/viewpage.action?pageId=27363329",
+        "optimizer_type": "html2md",
+        "api_key": "",
+        "api_url": "",
+        "model": "",
+    }
+}
+
+_DIFY_UPLOAD_REQUEST_EXAMPLE = {
+    "example": {
+        "dataset_prefix": "智慧数据标准知识库",
+        "max_docs": 12000,
+        "indexing_technique": "high_quality",
+    }
+}
+
+_JIRA_ITOPS_REQUEST_EXAMPLE = {
+    "example": {
+        "summary": "ITOPS工单标题",
+        "assignee": "zengdi",
+        "creater": "zengdi",
+        "password": "1",
+        "issuetype": "11203",
+        "description": "工单详细描述",
+    }
+}
 
 
 class CrawlRequest(BaseModel):
@@ -27,18 +65,7 @@ class CrawlRequest(BaseModel):
 
     start_at: int = Field(default=0, description="起始位置")
 
-    class Config:
-        """配置."""
-
-        json_schema_extra = {
-            "example": {
-                "page_size": 500,
-                "start_at": 0,
-                "description_limit": 400,
-                "comments_limit": 10,
-                "jql": "assignee = currentUser() AND resolution = Unresolved order by updated DESC",
-            }
-        }
+    model_config = ConfigDict(json_schema_extra=_CRAWL_REQUEST_EXAMPLE)
 
 
 class CrawlKMSRequest(BaseModel):
@@ -58,18 +85,7 @@ class CrawlKMSRequest(BaseModel):
 
     model: str = Field(default="", description="兼容openai模型")
 
-    class Config:
-        """配置."""
-
-        json_schema_extra = {
-            "example": {
-                "start_url": "http://kms.new-see.com:8090/pages/viewpage.action?pageId=27363329",
-                "optimizer_type": "html2md",
-                "api_key": "",
-                "api_url": "",
-                "model": "",
-            }
-        }
+    model_config = ConfigDict(json_schema_extra=_CRAWL_KMS_REQUEST_EXAMPLE)
 
 
 class DifyUploadRequest(BaseModel):
@@ -98,16 +114,7 @@ class DifyUploadRequest(BaseModel):
         description="Dify知识库的API key",
     )
 
-    class Config:
-        """配置."""
-
-        json_schema_extra = {
-            "example": {
-                "dataset_prefix": "智慧数据标准知识库",
-                "max_docs": 12000,
-                "indexing_technique": "high_quality",
-            }
-        }
+    model_config = ConfigDict(json_schema_extra=_DIFY_UPLOAD_REQUEST_EXAMPLE)
 
 
 class JiraITOPSRequest(BaseModel):
@@ -120,16 +127,4 @@ class JiraITOPSRequest(BaseModel):
     issuetype: str = Field(default="11203", description="问题类型ID")
     description: str = Field(default="工单描述", description="工单描述")
 
-    class Config:
-        """配置."""
-
-        json_schema_extra = {
-            "example": {
-                "summary": "ITOPS工单标题",
-                "assignee": "zengdi",
-                "creater": "zengdi",
-                "password": "1",
-                "issuetype": "11203",
-                "description": "工单详细描述",
-            }
-        }
+    model_config = ConfigDict(json_schema_extra=_JIRA_ITOPS_REQUEST_EXAMPLE)
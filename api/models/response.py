@@ -1,12 +1,11 @@
 """响应模型定义."""
 
-from typing import Optional, Dict, Any, List, Annotated
-from uuid import UUID
-
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Type
-from pydantic import BaseModel, Field, create_model
+from typing import Any, Generic, List, Optional, TypeVar
+from uuid import UUID
 
+from pydantic import BaseModel, Field
 
 class TaskStatus(BaseModel):
     """任务状态响应."""
@@ -18,6 +17,49 @@ class TaskStatus(BaseModel):
     updated_at: datetime = Field(..., description="更新时间")
     message: Optional[str] = Field(None, description="状态消息")
 
+    @classmethod
+    def from_task(cls, task: Any) -> "TaskStatus":
+        """由数据库任务记录构建状态响应.
+
+        数据库中的数据在写入时已经校验过，使用 model_construct 跳过重复校验。
+        """
+        return cls.model_construct(
+            task_id=task.id,
+            task_mode=task.task_mode,
+            status=task.status,
+            created_at=task.created_at,
+            updated_at=task.updated_at,
+            message=task.message,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class TaskStatusOut:
+    """任务状态的轻量输出结构.
+
+    只读接口直接交给 orjson 序列化（原生支持 dataclass、UUID、datetime），
+    绕过 pydantic 的校验和序列化；TaskStatus 仅用于 OpenAPI 文档。
+    """
+
+    task_id: UUID
+    task_mode: str
+    status: str
+    created_at: datetime
+    updated_at: datetime
+    message: Optional[str] = None
+
+    @classmethod
+    def from_task(cls, task: Any) -> "TaskStatusOut":
+        """由数据库任务记录构建输出结构."""
+        return cls(
+            task_id=task.id,
+            task_mode=task.task_mode,
+            status=task.status,
+            created_at=task.created_at,
+            updated_at=task.updated_at,
+            message=task.message,
+        )
+
 
 class TaskResponse(BaseModel):
     """任务创建响应."""
@@ -26,22 +68,26 @@ class TaskResponse(BaseModel):
     message: str = Field(..., description="状态消息")
 
 
-class TaskList(BaseModel):
-    """任务列表响应."""
+StatusT = TypeVar("StatusT", bound=BaseModel)
+
+
+class TaskListBase(BaseModel, Generic[StatusT]):
+    """分页任务列表响应，按任务状态模型参数化."""
 
-    tasks: List[TaskStatus] = Field(..., description="任务列表")
+    tasks: List[StatusT] = Field(..., description="任务列表")
     total: int = Field(..., description="总数")
     skip: int = Field(..., description="跳过数")
     limit: int = Field(..., description="限制数")
+    next_cursor: Optional[datetime] = Field(
+        None, description="下一页游标，作为 cursor 参数传入获取下一页，没有更多数据时为空"
+    )
+    next_cursor_id: Optional[UUID] = Field(
+        None, description="下一页游标ID，作为 cursor_id 参数与 cursor 一起传入"
+    )
 
 
-class BinaryFileSchema(BaseModel):
-    """仅用于API文档展示的二进制文件模型"""
-
-    file: Annotated[bytes, Field(description="二进制文件内容")]
-
-    class Config:
-        json_schema_extra = {"type": "string", "format": "binary", "description": "二进制文件内容"}
+class TaskList(TaskListBase[TaskStatus]):
+    """任务列表响应."""
 
 
 class DifyTaskStatus(BaseModel):
@@ -67,14 +113,9 @@ class DifyTaskResponse(BaseModel):
     message: str = Field(..., description="状态消息")
 
 
-class DifyTaskList(BaseModel):
+class DifyTaskList(TaskListBase[DifyTaskStatus]):
     """Dify 任务列表响应."""
 
-    tasks: List[DifyTaskStatus] = Field(..., description="任务列表")
-    total: int = Field(..., description="总数")
-    skip: int = Field(..., description="跳过数")
-    limit: int = Field(..., description="限制数")
-
 
 class JiraITOPSResponse(BaseModel):
     """Jira ITOPS工单创建响应."""
@@ -4,22 +4,42 @@ import os
 import shutil
 import asyncio
 import logging
-
+import time
 from datetime import datetime
-from typing import Optional, List
+
+from typing import Literal, Optional, List
 from uuid import UUID, uuid4
 
 from fastapi import Depends, HTTPException, Query, APIRouter, Security
 from fastapi.security import HTTPBearer
-from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
-from sqlmodel import Session, select
+from fastapi.responses import FileResponse, StreamingResponse, ORJSONResponse
+from sqlmodel import Session, func, select
 
 from api.database.models import Task
+from api.database.crud import (
+    OWNER_PID_KEY,
+    complete_task,
+    get_task_by_id,
+    paginate_by_created,
+    set_task_pid,
+    update_task_status,
+)
 from api.database.db import get_db, engine
 from api.models.request import CrawlKMSRequest
-from api.models.response import TaskStatus, TaskResponse, TaskList, BinaryFileSchema
+from api.models.response import TaskStatus, TaskStatusOut, TaskResponse, TaskList
 from api.router.api_service import TEMP_DIR
-from api.utils import create_streaming_zip_response, create_streaming_targz_response, validate_task_for_download
+from api.utils import (
+    DOWNLOAD_RESPONSES,
+    ZIP_COMPRESSION,
+    ZSTD_LEVEL,
+    ZSTD_ARCHIVAL_LEVEL,
+    create_streaming_zip_response,
+    create_streaming_targz_response,
+    create_streaming_tarzst_response,
+    validate_task_for_download,
+    spawn_background_task,
+    run_with_crawler_limit,
+)
 
 # 配置日志
 logger = logging.getLogger("uvicorn")
@@ -36,13 +56,51 @@ router = APIRouter(
 )
 
 
+# 爬虫命令的固定前缀及回调地址前缀，导入时读取一次环境变量
+_CRAWLER_BASE = ("uv", "run", "-m", "crawler.main")
+API_ROOT_PORT = os.getenv("API_ROOT_PORT", "8000")
+API_ROOT_PATH = os.getenv("API_ROOT_PATH", "")
+_CALLBACK_BASE = f"http://localhost:{API_ROOT_PORT}{API_ROOT_PATH}/api/kms/callback"
+
+# 爬虫子进程的输出日志目录及失败时读取的错误日志长度；
+# 日志不放在任务目录内，避免被打包进下载结果或导入 Dify
+CRAWLER_LOG_DIR = TEMP_DIR / "logs"
+CRAWLER_LOG_DIR.mkdir(parents=True, exist_ok=True)
+CRAWLER_ERROR_TAIL_BYTES = 4096
+
+
+def crawler_log_paths(task_id: UUID) -> tuple[str, str]:
+    """返回爬虫任务的标准输出和错误输出日志路径."""
+    return (
+        str(CRAWLER_LOG_DIR / f"{task_id}.stdout.log"),
+        str(CRAWLER_LOG_DIR / f"{task_id}.stderr.log"),
+    )
+
+
+def remove_crawler_logs(task_id: UUID) -> None:
+    """删除爬虫任务的日志文件，文件不存在时静默跳过."""
+    for log_path in crawler_log_paths(task_id):
+        try:
+            os.remove(log_path)
+        except FileNotFoundError:
+            pass
+
+
+def read_log_tail(log_path: str, max_bytes: int = CRAWLER_ERROR_TAIL_BYTES) -> str:
+    """读取日志文件末尾的内容."""
+    try:
+        with open(log_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - max_bytes, 0))
+            return f.read().decode("utf-8", errors="replace")  # 处理无法解码的字符
+    except OSError:
+        return ""
+
+
 # 根据ID获取任务
-def get_kms_task_by_id(task_id: UUID, db: Session):
+def get_kms_task_by_id(task_id: UUID, db: Session) -> Optional[Task]:
     """根据ID获取KMS任务."""
-    task = db.get(Task, task_id)
-    if task and task.task_mode == "kms":
-        return task
-    return None
+    return get_task_by_id(task_id, "kms", db)
 
 
 # 创建新任务
@@ -61,44 +119,12 @@ def create_kms_task(
         status="pending",
         jql=start_url,  # 使用jql字段存储起始URL
         output_dir=output_dir,
-        start_time=datetime.now().timestamp(),  # 转换为时间戳
+        start_time=time.time(),  # 转换为时间戳
         callback_url=callback_url,
-        extra_data=kwargs,
+        extra_data={**kwargs, OWNER_PID_KEY: os.getpid()},
     )
     db.add(task)
     db.commit()
-    db.refresh(task)
-    return task
-
-
-# 更新任务状态
-def update_kms_task_status(
-    task: Task,
-    status: str,
-    message: Optional[str] = None,
-    error: Optional[str] = None,
-    db: Session = None,
-    **kwargs,
-):
-    """更新KMS任务状态."""
-    task.status = status
-    task.message = message
-
-    if status in ["completed", "failed"]:
-        task.end_time = datetime.now().timestamp()
-
-    if error:
-        task.error = error
-
-    for key, value in kwargs.items():
-        if hasattr(task, key):
-            setattr(task, key, value)
-
-    if db:
-        db.add(task)
-        db.commit()
-        db.refresh(task)
-
     return task
 
 
@@ -118,9 +144,9 @@ async def start_kms_crawl(request: CrawlKMSRequest, db: Session = Depends(get_db
     # 生成任务ID
     task_id = uuid4()
 
-    # 创建输出目录
-    output_dir = os.path.join(TEMP_DIR, str(task_id))
-    os.makedirs(output_dir, exist_ok=True)
+    # 创建输出目录，文件系统操作放到线程中执行
+    output_dir = str(TEMP_DIR / str(task_id))
+    await asyncio.to_thread(os.makedirs, output_dir, exist_ok=True)
 
     # 创建任务记录
     task = create_kms_task(
@@ -128,16 +154,18 @@ async def start_kms_crawl(request: CrawlKMSRequest, db: Session = Depends(get_db
         start_url=request.start_url,
         output_dir=output_dir,
         db=db,
-        callback_url=f"http://localhost:8000/api/kms/callback/{task_id}",
+        callback_url=f"{_CALLBACK_BASE}/{task_id}",
         **request.model_dump(exclude={"start_url"}),
     )
 
     # 异步启动爬虫
-    asyncio.create_task(
-        run_confluence_crawler(
-            task_id=task_id,
-            start_url=request.start_url,
-            **request.model_dump(exclude={"start_url"}),
+    spawn_background_task(
+        run_with_crawler_limit(
+            run_confluence_crawler(
+                task_id=task_id,
+                start_url=request.start_url,
+                **request.model_dump(exclude={"start_url"}),
+            )
         )
     )
 
@@ -156,98 +184,80 @@ async def run_confluence_crawler(task_id: UUID, start_url: str, **kwargs) -> Non
             # 获取任务信息
             task = get_kms_task_by_id(task_id, db)
             if not task:
-                logger.error(f"任务不存在: {task_id}")
+                logger.error("任务不存在: %s", task_id)
                 return
 
             # 更新任务状态为运行中
-            update_kms_task_status(
+            update_task_status(
                 task=task, status="running", message="KMS爬虫任务启动中...", db=db
             )
 
             # 准备爬虫命令
             output_dir = task.output_dir
 
-            API_ROOT_PORT = os.getenv("API_ROOT_PORT", "8000")
-            API_ROOT_PATH = os.getenv("API_ROOT_PATH", "")
-            # 构建爬虫命令
+            # 构建爬虫命令，可选参数只添加非None的值，并统一转为字符串
             crawler_cmd = [
-                "uv",
-                "run",
-                "-m",
-                "crawler.main",
+                *_CRAWLER_BASE,
                 "--start_url",
                 start_url,
                 "--output_dir",
                 output_dir,
                 "--callback_url",
-                f"http://localhost:{API_ROOT_PORT}{API_ROOT_PATH}/api/kms/callback/{task_id}",
+                f"{_CALLBACK_BASE}/{task_id}",
+                *(
+                    arg
+                    for key, value in kwargs.items()
+                    if value is not None
+                    for arg in (f"--{key}", str(value))
+                ),
             ]
 
-            # 添加可选参数
-            for key, value in kwargs.items():
-                if value is not None:  # 只添加非None的参数
-                    crawler_cmd.append(f"--{key}")
-                    crawler_cmd.append(str(value))  # 确保值是字符串
-
             # 记录完整命令
             cmd_str = " ".join(crawler_cmd)
-            logger.info(f"执行爬虫命令: {cmd_str}")
-
-            # 使用线程池执行子进程
-            loop = asyncio.get_event_loop()
-            from concurrent.futures import ThreadPoolExecutor
-            import subprocess
-            
-            with ThreadPoolExecutor() as pool:
-                process = await loop.run_in_executor(
-                    pool,
-                    lambda: subprocess.Popen(
-                        crawler_cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                        encoding='utf-8',
-                        errors='replace'  # 处理无法解码的字符
-                    )
+            logger.info("执行爬虫命令: %s", cmd_str)
+
+            # 使用 asyncio 原生子进程，输出直接写入日志目录下的文件，不在内存中缓冲
+            stdout_path, stderr_path = crawler_log_paths(task_id)
+            with open(stdout_path, "wb") as log_stdout, open(stderr_path, "wb") as log_stderr:
+                process = await asyncio.create_subprocess_exec(
+                    *crawler_cmd,
+                    stdout=log_stdout,
+                    stderr=log_stderr,
+                )
+                set_task_pid(task, process.pid, db)
+                return_code = await process.wait()
+
+            # 检查爬虫执行结果
+            if return_code != 0:
+                # 爬虫执行失败，取错误日志末尾作为错误信息
+                error_msg = read_log_tail(stderr_path) or "爬虫执行失败，未知错误"
+                logger.error("爬虫执行失败: %s", error_msg)
+                update_task_status(
+                    task=task,
+                    status="failed",
+                    message="爬虫执行失败",
+                    error=error_msg,
+                    db=db,
+                )
+            else:
+                # 爬虫执行成功
+                update_task_status(
+                    task=task, status="completed", message="KMS爬虫任务已完成", db=db
                 )
-
-                # 异步读取输出
-                stdout, stderr = await loop.run_in_executor(pool, process.communicate)
-                return_code = process.returncode
-
-                # 检查爬虫执行结果
-                if return_code != 0:
-                    # 爬虫执行失败
-                    error_msg = stderr or "爬虫执行失败，未知错误"
-                    logger.error(f"爬虫执行失败: {error_msg}")
-                    update_kms_task_status(
-                        task=task,
-                        status="failed",
-                        message="爬虫执行失败",
-                        error=error_msg,
-                        db=db,
-                    )
-                else:
-                    # 爬虫执行成功
-                    update_kms_task_status(
-                        task=task, status="completed", message="KMS爬虫任务已完成", db=db
-                    )
         finally:
             db.close()
 
     except Exception as e:
         # 捕获其他异常
         error_msg = str(e)
-        logger.error(f"Confluence爬虫执行失败：{error_msg}")
-        import traceback
-        logger.error(f"异常详情：\n{traceback.format_exc()}")
+        logger.exception("Confluence爬虫执行失败：%s", error_msg)
         try:
             # 创建新的数据库会话来记录错误
             error_db = Session(engine)
             try:
                 task = get_kms_task_by_id(task_id, error_db)
                 if task:
-                    update_kms_task_status(
+                    update_task_status(
                         task=task,
                         status="failed",
                         message="爬虫执行失败",
@@ -257,81 +267,84 @@ async def run_confluence_crawler(task_id: UUID, start_url: str, **kwargs) -> Non
             finally:
                 error_db.close()
         except Exception as e2:
-            logger.error(f"更新任务状态失败：{e2}")
+            logger.error("更新任务状态失败：%s", e2)
 
 
 @router.get(
     "/task/{task_id}",
-    response_model=TaskStatus,
+    response_model=None,
+    responses={200: {"model": TaskStatus}},
 )
-async def get_kms_task_status(task_id: UUID, db: Session = Depends(get_db)) -> TaskStatus:
+async def get_kms_task_status(task_id: UUID, db: Session = Depends(get_db)) -> ORJSONResponse:
     """获取KMS任务状态."""
     task = get_kms_task_by_id(task_id, db)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
-    return TaskStatus(
-        task_id=task.id,
-        task_mode=task.task_mode,
-        status=task.status,
-        created_at=task.created_at,
-        updated_at=task.updated_at,
-        message=task.message,
-    )
+    return ORJSONResponse(TaskStatusOut.from_task(task))
 
 
 @router.get(
     "/tasks",
-    response_model=TaskList,
+    response_model=None,
+    responses={200: {"model": TaskList}},
 )
 async def list_kms_tasks(
-    skip: int = Query(0, description="跳过记录数"),
-    limit: int = Query(10, description="返回记录数"),
+    skip: int = Query(0, ge=0, description="跳过记录数"),
+    limit: int = Query(10, ge=1, le=200, description="返回记录数"),
     status: str = Query(None, description="按状态筛选"),
+    cursor: Optional[datetime] = Query(
+        None, description="分页游标，传入上一页返回的 next_cursor，提供时忽略 skip"
+    ),
+    cursor_id: Optional[UUID] = Query(
+        None, description="分页游标ID，传入上一页返回的 next_cursor_id"
+    ),
     db: Session = Depends(get_db),
-) -> TaskList:
+) -> ORJSONResponse:
     """获取KMS任务列表."""
-    query = select(Task).where(Task.task_mode == "kms")
+    filters = [Task.task_mode == "kms"]
     if status:
-        query = query.where(Task.status == status)
-    query = query.offset(skip).limit(limit).order_by(Task.created_at.desc())
+        filters.append(Task.status == status)
+
+    # 总数使用 COUNT 查询，不受分页 limit 影响
+    total = db.exec(select(func.count()).select_from(Task).where(*filters)).one()
 
+    query = paginate_by_created(
+        select(Task).where(*filters), Task.created_at, Task.id, skip, limit, cursor, cursor_id
+    )
     tasks = db.exec(query).all()
-    total = len(tasks)
-
-    return TaskList(
-        tasks=[
-            TaskStatus(
-                task_id=t.id,
-                task_mode=t.task_mode,
-                status=t.status,
-                created_at=t.created_at,
-                updated_at=t.updated_at,
-                message=t.message,
-            )
-            for t in tasks
-        ],
-        total=total,
-        skip=skip,
-        limit=limit,
+    has_more = len(tasks) == limit
+
+    return ORJSONResponse(
+        {
+            "tasks": [TaskStatusOut.from_task(t) for t in tasks],
+            "total": total,
+            "skip": skip,
+            "limit": limit,
+            "next_cursor": tasks[-1].created_at if has_more else None,
+            "next_cursor_id": tasks[-1].id if has_more else None,
+        }
     )
 
 
 @router.post("/callback/{task_id}", include_in_schema=False)
-async def kms_task_callback(task_id: UUID, db: Session = Depends(get_db)) -> dict:
+async def kms_task_callback(task_id: UUID, db: Session = Depends(get_db)) -> ORJSONResponse:
     """KMS爬虫任务回调."""
-    task = get_kms_task_by_id(task_id, db)
-    if not task:
+    if not complete_task(task_id, "kms", db):
         raise HTTPException(status_code=404, detail="任务不存在，请重新建立")
 
-    update_kms_task_status(task=task, status="completed", message="任务已完成", db=db)
-
-    return {"status": "received"}
+    return ORJSONResponse({"status": "received"})
 
 
-@router.get("/download/{task_id}", response_class=StreamingResponse)
+@router.get(
+    "/download/{task_id}", response_class=StreamingResponse, responses=DOWNLOAD_RESPONSES
+)
 async def download_kms_result(
     task_id: UUID,
-    format: str = Query("zip", description="下载格式，支持 zip 或 tar.gz"),
+    format: str = Query("zip", description="下载格式，支持 zip、tar.gz 或 tar.zst"),
+    compression: Literal["store", "deflate"] = Query(
+        "deflate", description="ZIP 压缩方式，store 不压缩(内网下载更快)，deflate 标准压缩"
+    ),
+    archival: bool = Query(False, description="tar.zst 使用高压缩级别，适合归档保存"),
     db: Session = Depends(get_db)
 ) -> StreamingResponse:
     """
@@ -339,7 +352,9 @@ async def download_kms_result(
 
     Args:
         task_id: 任务ID
-        format: 下载格式，支持 zip 或 tar.gz，默认为 zip
+        format: 下载格式，支持 zip、tar.gz 或 tar.zst，默认为 zip
+        compression: ZIP 压缩方式，支持 store 或 deflate，默认为 deflate
+        archival: tar.zst 是否使用归档压缩级别，默认为 False
         db: 数据库会话
 
     Returns:
@@ -356,16 +371,25 @@ async def download_kms_result(
             file_name = f"kms_result_{task_id}.tar.gz"
             # 返回流式TAR.GZ响应
             return await create_streaming_targz_response(task_dir, file_name, task_id)
+        elif format.lower() == "tar.zst":
+            file_name = f"kms_result_{task_id}.tar.zst"
+            # 返回流式TAR.ZST响应，多线程压缩
+            level = ZSTD_ARCHIVAL_LEVEL if archival else ZSTD_LEVEL
+            return await create_streaming_tarzst_response(
+                task_dir, file_name, task_id, compress_level=level
+            )
         else:
             # 创建ZIP文件名
             file_name = f"kms_result_{task_id}.zip"
             # 返回流式ZIP响应
-            return await create_streaming_zip_response(task_dir, file_name, task_id)
+            return await create_streaming_zip_response(
+                task_dir, file_name, task_id, compression=ZIP_COMPRESSION[compression]
+            )
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"下载 KMS 任务结果失败: {str(e)}")
+        logger.error("下载 KMS 任务结果失败: %s", e)
         raise HTTPException(status_code=500, detail=f"下载 KMS 任务结果失败: {str(e)}")
 
 
@@ -388,12 +412,10 @@ async def delete_kms_task(task_id: UUID, db: Session = Depends(get_db)) -> dict:
             status_code=400, detail=f"任务尚未完成，请等待任务完成后再删除。当前状态：{task.status}"
         )
 
-    # 删除任务目录
-    task_dir = os.path.join(TEMP_DIR, str(task_id))
-    if os.path.exists(task_dir):
-        shutil.rmtree(task_dir)
-    else:
-        logger.warning(f"任务目录不存在：{task_dir}")
+    # 删除任务目录，在线程中执行避免阻塞事件循环，目录不存在时静默跳过
+    task_dir = str(TEMP_DIR / str(task_id))
+    await asyncio.to_thread(shutil.rmtree, task_dir, ignore_errors=True)
+    await asyncio.to_thread(remove_crawler_logs, task_id)
 
     # 删除数据库记录
     db.delete(task)
@@ -3,18 +3,17 @@
 import os
 import shutil
 import asyncio
-import subprocess
-from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 import logging
+import time
 from datetime import datetime
-from typing import Optional, List
+from typing import Literal, Optional, List
 from uuid import UUID, uuid4
 from pathlib import Path
 
 from fastapi import HTTPException, Depends, Query, Security, APIRouter
 from fastapi.responses import FileResponse, StreamingResponse
-from sqlmodel import Session, select
+from sqlmodel import Session, func, select
 from fastapi.security import HTTPBearer
 
 # 新的示例和router模式
@@ -22,18 +21,32 @@ from fastapi import APIRouter
 
 from api.models.request import CrawlRequest
 from api.database.models import Task, ApiLog
+from api.database.crud import (
+    OWNER_PID_KEY,
+    complete_task,
+    get_task_by_id,
+    paginate_by_created,
+    set_task_pid,
+    update_task_status,
+)
 from api.database.db import get_db, engine
 from api.models.response import (
-    BinaryFileSchema,
     TaskList,
     TaskResponse,
     TaskStatus,
 )
 
 from api.utils import (
+    DOWNLOAD_RESPONSES,
+    ZIP_COMPRESSION,
+    ZSTD_LEVEL,
+    ZSTD_ARCHIVAL_LEVEL,
     create_streaming_zip_response,
     create_streaming_targz_response,
+    create_streaming_tarzst_response,
     validate_task_for_download,
+    spawn_background_task,
+    run_with_crawler_limit,
 )
 
 
@@ -51,17 +64,23 @@ router = APIRouter(
     dependencies=[Security(security_scheme)],  # 为所有路由添加 Bearer Token 认证
 )
 
-# 临时爬虫到的文件目录
-TEMP_DIR = os.path.join(os.path.dirname(__package__), "api/temp_scrapy")
-os.makedirs(TEMP_DIR, exist_ok=True)
+# Jira 爬虫命令的固定前缀及透传给爬虫的可选参数
+_CRAWLER_BASE = ("uv", "run", "-m", "jira.main")
+_CRAWLER_OPTIONAL_PARAMS = ("description_limit", "comments_limit", "page_size", "start_at")
+
+# 爬虫回调地址前缀，导入时读取一次API端口和根路径
+API_ROOT_PORT = os.getenv("API_ROOT_PORT", "8000")
+API_ROOT_PATH = os.getenv("API_ROOT_PATH", "")
+_CALLBACK_BASE = f"http://localhost:{API_ROOT_PORT}{API_ROOT_PATH}/api/jira/callback"
 
+# 临时爬虫到的文件目录，基于模块位置解析，不依赖启动时的工作目录
+TEMP_DIR = Path(__file__).resolve().parent.parent / "temp_scrapy"
+TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
-def get_task_by_id(task_id: UUID, db: Session) -> Optional[Task]:
-    """根据ID获取任务."""
-    task = db.get(Task, task_id)
-    if task and task.task_mode == "jira":
-        return task
-    return None
+
+def get_jira_task_by_id(task_id: UUID, db: Session) -> Optional[Task]:
+    """根据ID获取Jira任务."""
+    return get_task_by_id(task_id, "jira", db)
 
 
 def create_task(
@@ -73,9 +92,9 @@ def create_task(
         status="pending",
         jql=jql,
         output_dir=output_dir,
-        start_time=datetime.now().timestamp(),
+        start_time=time.time(),
         callback_url=callback_url,
-        extra_data=kwargs,
+        extra_data={**kwargs, OWNER_PID_KEY: os.getpid()},
     )
     db.add(task)
     db.commit()
@@ -83,35 +102,6 @@ def create_task(
     return task
 
 
-def update_task_status(
-    task: Task,
-    status: str,
-    message: Optional[str] = None,
-    error: Optional[str] = None,
-    db: Session = None,
-    **kwargs,
-) -> Task:
-    """更新任务状态."""
-    task.status = status
-    task.message = message
-    task.error = error
-
-    if status in ["completed", "failed"]:
-        task.end_time = datetime.now().timestamp()
-        if task.start_time:
-            task.duration_seconds = task.end_time - task.start_time
-
-    # 更新其他属性
-    for key, value in kwargs.items():
-        if hasattr(task, key):
-            setattr(task, key, value)
-
-    if db:
-        db.commit()
-        db.refresh(task)
-    return task
-
-
 @router.post(
     "/crawl",
     response_model=TaskResponse,
@@ -119,9 +109,9 @@ def update_task_status(
 async def start_crawl(request: CrawlRequest, db: Session = Depends(get_db)) -> Task:
     """启动爬虫任务."""
     task_id = uuid4()
-    task_dir = str(Path(TEMP_DIR) / str(task_id))
-    os.makedirs(task_dir, exist_ok=True)
-    logger.info(f"Created task directory: {task_dir}")
+    task_dir = str(TEMP_DIR / str(task_id))
+    await asyncio.to_thread(os.makedirs, task_dir, exist_ok=True)
+    logger.info("Created task directory: %s", task_dir)
 
     # 创建任务记录
     task = create_task(
@@ -134,7 +124,9 @@ async def start_crawl(request: CrawlRequest, db: Session = Depends(get_db)) -> T
     )
 
     # 异步启动爬虫任务
-    asyncio.create_task(run_crawler(task_id, **request.model_dump(exclude={"jql"})))
+    spawn_background_task(
+        run_with_crawler_limit(run_crawler(task_id, **request.model_dump(exclude={"jql"})))
+    )
 
     return TaskResponse(
         task_id=task.id,
@@ -149,70 +141,51 @@ async def run_crawler(task_id: UUID, **kwargs):
         db = Session(engine)
         try:
             # 获取任务信息
-            task = get_task_by_id(task_id, db)
+            task = get_jira_task_by_id(task_id, db)
             if not task:
-                logger.error(f"Task {task_id} not found")
+                logger.error("Task %s not found", task_id)
                 return
 
             # 更新任务状态为运行中
             update_task_status(task, "running", db=db)
 
-            # 构建命令参数列表
+            # 构建命令参数列表，可选参数只添加非None的值
             cmd_parts = [
-                "uv", "run", "-m", "jira.main",
+                *_CRAWLER_BASE,
                 "--jql", task.jql,
                 "--output_dir", task.output_dir,
+                *(
+                    arg
+                    for name in _CRAWLER_OPTIONAL_PARAMS
+                    if (value := kwargs.get(name)) is not None
+                    for arg in (f"--{name}", str(value))
+                ),
+                "--callback_url", f"{_CALLBACK_BASE}/{task_id}",
             ]
 
-            # 从kwargs中获取可选参数
-            optional_params = {
-                "description_limit": kwargs.get("description_limit"),
-                "comments_limit": kwargs.get("comments_limit"),
-                "page_size": kwargs.get("page_size"),
-                "start_at": kwargs.get("start_at")
-            }
-
-            # 添加可选参数
-            for param_name, param_value in optional_params.items():
-                if param_value is not None:
-                    cmd_parts.extend([f"--{param_name}", str(param_value)])
-
-            # 获取API根路径
-            API_ROOT_PORT = os.getenv("API_ROOT_PORT", "8000")
-            API_ROOT_PATH = os.getenv("API_ROOT_PATH", "")
-
-            # 添加回调URL
-            callback_url = f"http://localhost:{API_ROOT_PORT}{API_ROOT_PATH}/api/jira/callback/{task_id}"
-            cmd_parts.extend(["--callback_url", callback_url])
-
             # 记录完整命令
             cmd_str = " ".join(cmd_parts)
-            logger.info(f"Running command: {cmd_str}")
-
-            # 使用线程池执行子进程
-            loop = asyncio.get_event_loop()
-            with ThreadPoolExecutor() as pool:
-                process = await loop.run_in_executor(
-                    pool,
-                    lambda: subprocess.Popen(
-                        cmd_parts,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                        encoding='utf-8',
-                        errors='replace'  # 处理无法解码的字符
-                    )
-                )
-
-                # 异步读取输出
-                stdout, stderr = await loop.run_in_executor(pool, process.communicate)
-                return_code = process.returncode
-
-                if return_code != 0:
-                    error_msg = f"爬虫进程异常退出，返回码：{return_code}"
-                    if stderr:
-                        error_msg += f"\n错误输出：{stderr}"
-                    raise RuntimeError(error_msg)
+            logger.info("Running command: %s", cmd_str)
+
+            # 使用 asyncio 原生子进程，等待期间不占用线程；
+            # 标准输出不会被使用，直接丢弃，只收集失败时需要的错误输出
+            process = await asyncio.create_subprocess_exec(
+                *cmd_parts,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            set_task_pid(task, process.pid, db)
+
+            # 异步读取错误输出
+            _, stderr = await process.communicate()
+            return_code = process.returncode
+
+            if return_code != 0:
+                error_msg = f"爬虫进程异常退出，返回码：{return_code}"
+                if stderr:
+                    # 处理无法解码的字符
+                    error_msg += f"\n错误输出：{stderr.decode('utf-8', errors='replace')}"
+                raise RuntimeError(error_msg)
 
         finally:
             db.close()
@@ -220,20 +193,18 @@ async def run_crawler(task_id: UUID, **kwargs):
     except Exception as e:
         # 捕获其他异常
         error_msg = f"爬虫执行失败：{str(e)}"
-        logger.error(error_msg)
-        import traceback
-        logger.error(f"异常详情：\n{traceback.format_exc()}")
+        logger.exception(error_msg)
         try:
             # 创建新的数据库会话来记录错误
             error_db = Session(engine)
             try:
-                task = get_task_by_id(task_id, error_db)
+                task = get_jira_task_by_id(task_id, error_db)
                 if task:
                     update_task_status(task, "error", error=error_msg, db=error_db)
             finally:
                 error_db.close()
         except Exception as db_error:
-            logger.error(f"更新任务状态失败：{str(db_error)}")
+            logger.error("更新任务状态失败：%s", db_error)
 
 
 @router.get(
@@ -242,16 +213,10 @@ async def run_crawler(task_id: UUID, **kwargs):
 )
 async def get_task_status(task_id: UUID, db: Session = Depends(get_db)) -> TaskStatus:
     """获取任务状态."""
-    task = get_task_by_id(task_id, db)
+    task = get_jira_task_by_id(task_id, db)
     if not task:
         raise HTTPException(status_code=404, detail="任务无法找到，请重新建立")
-    return TaskStatus(
-        task_id=task.id,
-        status=task.status,
-        created_at=task.created_at,
-        updated_at=task.updated_at,
-        message=task.message,
-    )
+    return TaskStatus.from_task(task)
 
 
 @router.get(
@@ -259,54 +224,60 @@ async def get_task_status(task_id: UUID, db: Session = Depends(get_db)) -> TaskS
     response_model=TaskList,
 )
 async def list_tasks(
-    skip: int = Query(0, description="跳过记录数"),
-    limit: int = Query(10, description="返回记录数"),
+    skip: int = Query(0, ge=0, description="跳过记录数"),
+    limit: int = Query(10, ge=1, le=200, description="返回记录数"),
     status: str = Query(None, description="按状态筛选"),
+    cursor: Optional[datetime] = Query(
+        None, description="分页游标，传入上一页返回的 next_cursor，提供时忽略 skip"
+    ),
+    cursor_id: Optional[UUID] = Query(
+        None, description="分页游标ID，传入上一页返回的 next_cursor_id"
+    ),
     db: Session = Depends(get_db),
 ) -> TaskList:
     """获取jira任务列表."""
-    query = select(Task).where(Task.task_mode == "jira")
+    filters = [Task.task_mode == "jira"]
     if status:
-        query = query.where(Task.status == status)
-    query = query.offset(skip).limit(limit).order_by(Task.created_at.desc())
+        filters.append(Task.status == status)
 
+    # 总数使用 COUNT 查询，不受分页 limit 影响
+    total = db.exec(select(func.count()).select_from(Task).where(*filters)).one()
+
+    query = paginate_by_created(
+        select(Task).where(*filters), Task.created_at, Task.id, skip, limit, cursor, cursor_id
+    )
     tasks = db.exec(query).all()
-    total = len(tasks)
+    has_more = len(tasks) == limit
 
     return TaskList(
-        tasks=[
-            TaskStatus(
-                task_id=t.id,
-                task_mode=t.task_mode,
-                status=t.status,
-                created_at=t.created_at,
-                updated_at=t.updated_at,
-                message=t.message,
-            )
-            for t in tasks
-        ],
+        tasks=[TaskStatus.from_task(t) for t in tasks],
         total=total,
         skip=skip,
         limit=limit,
+        next_cursor=tasks[-1].created_at if has_more else None,
+        next_cursor_id=tasks[-1].id if has_more else None,
     )
 
 
 @router.post("/callback/{task_id}", include_in_schema=False)
 async def task_callback(task_id: UUID, db: Session = Depends(get_db)) -> dict:
     """爬虫任务回调."""
-    task = get_task_by_id(task_id, db)
-    if not task:
+    if not complete_task(task_id, "jira", db):
         raise HTTPException(status_code=404, detail="任务不存在")
 
-    update_task_status(task=task, status="completed", message="任务已完成", db=db)
-
     return {"status": "received"}
 
 
-@router.get("/download/{task_id}", response_class=StreamingResponse)
+@router.get(
+    "/download/{task_id}", response_class=StreamingResponse, responses=DOWNLOAD_RESPONSES
+)
 async def download_result(
     task_id: UUID,
-    format: str = Query("zip", description="下载格式，支持 zip 或 tar.gz"),
+    format: str = Query("zip", description="下载格式，支持 zip、tar.gz 或 tar.zst"),
+    compression: Literal["store", "deflate"] = Query(
+        "deflate", description="ZIP 压缩方式，store 不压缩(内网下载更快)，deflate 标准压缩"
+    ),
+    archival: bool = Query(False, description="tar.zst 使用高压缩级别，适合归档保存"),
     db: Session = Depends(get_db),
 ) -> StreamingResponse:
     """
@@ -314,7 +285,9 @@ async def download_result(
 
     Args:
         task_id: 任务ID
-        format: 下载格式，支持 zip 或 tar.gz，默认为 zip
+        format: 下载格式，支持 zip、tar.gz 或 tar.zst，默认为 zip
+        compression: ZIP 压缩方式，支持 store 或 deflate，默认为 deflate
+        archival: tar.zst 是否使用归档压缩级别，默认为 False
         db: 数据库会话
 
     Returns:
@@ -322,7 +295,7 @@ async def download_result(
     """
     try:
         # 验证任务是否可下载
-        result = await validate_task_for_download(task_id, db, get_task_by_id, TEMP_DIR)
+        result = await validate_task_for_download(task_id, db, get_jira_task_by_id, TEMP_DIR)
         task_dir = result["task_dir"]
 
         # 根据格式选择不同的下载方式
@@ -331,16 +304,25 @@ async def download_result(
             file_name = f"scrap_result_{task_id}.tar.gz"
             # 返回流式TAR.GZ响应
             return await create_streaming_targz_response(task_dir, file_name, task_id)
+        elif format.lower() == "tar.zst":
+            file_name = f"scrap_result_{task_id}.tar.zst"
+            # 返回流式TAR.ZST响应，多线程压缩
+            level = ZSTD_ARCHIVAL_LEVEL if archival else ZSTD_LEVEL
+            return await create_streaming_tarzst_response(
+                task_dir, file_name, task_id, compress_level=level
+            )
         else:
             # 创建ZIP文件名
             file_name = f"scrap_result_{task_id}.zip"
             # 返回流式ZIP响应
-            return await create_streaming_zip_response(task_dir, file_name, task_id)
+            return await create_streaming_zip_response(
+                task_dir, file_name, task_id, compression=ZIP_COMPRESSION[compression]
+            )
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"下载任务结果失败: {str(e)}")
+        logger.error("下载任务结果失败: %s", e)
         raise HTTPException(status_code=500, detail=f"下载任务结果失败: {str(e)}")
 
 
@@ -353,7 +335,7 @@ async def download_result(
 )
 async def delete_task(task_id: UUID, db: Session = Depends(get_db)) -> dict:
     """删除任务."""
-    task = get_task_by_id(task_id, db)
+    task = get_jira_task_by_id(task_id, db)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
 
@@ -363,12 +345,9 @@ async def delete_task(task_id: UUID, db: Session = Depends(get_db)) -> dict:
             status_code=400, detail=f"任务尚未完成，请等待任务完成后再删除。当前状态：{task.status}"
         )
 
-    # 删除任务目录
-    task_dir = str(Path(TEMP_DIR) / str(task_id))
-    if os.path.exists(task_dir):
-        shutil.rmtree(task_dir)
-    else:
-        logger.warning(f"任务目录不存在：{task_dir}")
+    # 删除任务目录，在线程中执行避免阻塞事件循环，目录不存在时静默跳过
+    task_dir = str(TEMP_DIR / str(task_id))
+    await asyncio.to_thread(shutil.rmtree, task_dir, ignore_errors=True)
 
     # 删除数据库记录
     db.delete(task)
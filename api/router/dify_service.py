@@ -3,24 +3,27 @@
 import os
 import asyncio
 import logging
+import time
+from datetime import datetime
 import requests
 import re
-from datetime import datetime
 from typing import Optional, List
 from uuid import UUID, uuid4
 
 from fastapi import HTTPException, Depends, Query, Security
 from fastapi.responses import FileResponse
-from sqlmodel import Session, select
+from sqlmodel import Session, func, select
 from fastapi.security import HTTPBearer
 
 from fastapi import APIRouter
 
 from api.models.request import DifyUploadRequest, JiraITOPSRequest
 from api.database.models import DifyTask, Task
+from api.database.crud import OWNER_PID_KEY, paginate_by_created, set_task_pid
 from api.database.db import get_db, engine
 from api.models.response import DifyTaskStatus, DifyTaskResponse, DifyTaskList, JiraITOPSResponse
 from api.router.api_service import TEMP_DIR
+from api.utils import spawn_background_task
 
 # 配置日志
 logger = logging.getLogger("uvicorn")
@@ -48,27 +51,31 @@ def get_task_by_id(task_id: UUID, db: Session) -> Optional[Task]:
 
 
 def create_dify_task(
-    task_id: UUID, crawler_task_id: UUID, dataset_prefix: str, max_docs: int, db: Session, **kwargs
+    task_id: UUID,
+    crawler_task_id: UUID,
+    input_dir: str,
+    dataset_prefix: str,
+    max_docs: int,
+    db: Session,
+    **kwargs,
 ) -> DifyTask:
-    """创建新的Dify任务."""
-    # 获取爬虫任务的输出目录路径
-    crawler_task = get_task_by_id(crawler_task_id, db)
-    if not crawler_task:
-        raise HTTPException(status_code=404, detail=f"爬虫任务 {crawler_task_id} 不存在")
-
-    # 检查爬虫任务的输出目录是否存在
-    task_dir = os.path.join(TEMP_DIR, str(crawler_task_id))
-    if not os.path.exists(task_dir) or not os.path.isdir(task_dir):
-        raise HTTPException(status_code=404, detail=f"爬虫任务目录 {task_dir} 不存在")
+    """创建新的Dify任务.
 
+    爬虫任务及其输出目录由调用方校验后传入，这里不再重复查询。
+    """
     task = DifyTask(
         id=task_id,
         status="pending",
-        input_dir=task_dir,  # 使用爬虫任务的输出目录
+        input_dir=input_dir,  # 使用爬虫任务的输出目录
         dataset_prefix=dataset_prefix,
         max_docs=max_docs,
-        start_time=datetime.now().timestamp(),
-        extra_data={"crawler_task_id": str(crawler_task_id), **kwargs},  # 记录关联的爬虫任务ID
+        start_time=time.time(),
+        # 记录关联的爬虫任务ID及创建任务的 API 进程
+        extra_data={
+            "crawler_task_id": str(crawler_task_id),
+            **kwargs,
+            OWNER_PID_KEY: os.getpid(),
+        },
     )
     db.add(task)
     db.commit()
@@ -82,15 +89,19 @@ def update_dify_task_status(
     message: Optional[str] = None,
     error: Optional[str] = None,
     db: Session = None,
+    refresh: bool = False,
     **kwargs,
 ) -> DifyTask:
-    """更新Dify任务状态."""
+    """更新Dify任务状态.
+
+    默认提交后不再 refresh，调用方需要立即读取最新字段时传入 refresh=True。
+    """
     task.status = status
     task.message = message
     task.error = error
 
     if status in ["completed", "failed"]:
-        task.end_time = datetime.now().timestamp()
+        task.end_time = time.time()
         if task.start_time:
             task.duration_seconds = task.end_time - task.start_time
 
@@ -101,7 +112,8 @@ def update_dify_task_status(
 
     if db:
         db.commit()
-        db.refresh(task)
+        if refresh:
+            db.refresh(task)
     return task
 
 
@@ -122,8 +134,8 @@ async def start_dify_upload(
         raise HTTPException(status_code=404, detail=f"爬虫任务 {crawler_task_id} 不存在")
 
     # 检查爬虫任务目录是否存在
-    task_dir = os.path.join(TEMP_DIR, str(crawler_task_id))
-    if not os.path.exists(task_dir) or not os.path.isdir(task_dir):
+    task_dir = str(TEMP_DIR / str(crawler_task_id))
+    if not await asyncio.to_thread(os.path.isdir, task_dir):
         raise HTTPException(status_code=404, detail=f"爬虫任务目录 {task_dir} 不存在")
 
     dify_task_id = uuid4()
@@ -132,6 +144,7 @@ async def start_dify_upload(
     task = create_dify_task(
         task_id=dify_task_id,
         crawler_task_id=crawler_task_id,
+        input_dir=task_dir,
         dataset_prefix=request.dataset_prefix,
         max_docs=request.max_docs,
         db=db,
@@ -139,7 +152,7 @@ async def start_dify_upload(
     )
 
     # 异步启动Dify导入任务
-    asyncio.create_task(run_dify_uploader(dify_task_id, **request.model_dump()))
+    spawn_background_task(run_dify_uploader(dify_task_id, **request.model_dump()))
 
     return DifyTaskResponse(
         task_id=task.id,
@@ -158,7 +171,7 @@ async def run_dify_uploader(task_id: UUID, **kwargs) -> None:
             DIFY_API_KEY = os.getenv("DIFY_API_KEY", "")
             DIFY_BASE_URL = os.getenv("DIFY_BASE_URL", "https://poc.new-see.com:88/v1")
             if not task:
-                logger.error(f"Task not found: {task_id}")
+                logger.error("Task not found: %s", task_id)
                 return
 
             # 更新任务状态为运行中
@@ -188,13 +201,13 @@ async def run_dify_uploader(task_id: UUID, **kwargs) -> None:
 
             # 记录完整命令
             cmd_str = " ".join(cmd)
-            logger.info(f"Running command: {cmd_str}")
+            logger.info("Running command: %s", cmd_str)
 
             # 使用线程池执行子进程
             from concurrent.futures import ThreadPoolExecutor
             import subprocess
 
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
 
             with ThreadPoolExecutor() as pool:
                 process = await loop.run_in_executor(
@@ -208,6 +221,7 @@ async def run_dify_uploader(task_id: UUID, **kwargs) -> None:
                         errors="replace",  # 处理无法解码的字符
                     ),
                 )
+                set_task_pid(task, process.pid, db)
 
                 # 异步读取输出
                 stdout, stderr = await loop.run_in_executor(pool, process.communicate)
@@ -256,10 +270,7 @@ async def run_dify_uploader(task_id: UUID, **kwargs) -> None:
     except Exception as e:
         # 捕获其他异常
         error_msg = str(e)
-        logger.error(f"Dify知识库导入执行失败：{error_msg}")
-        import traceback
-
-        logger.error(f"异常详情：\n{traceback.format_exc()}")
+        logger.exception("Dify知识库导入执行失败：%s", error_msg)
         try:
             # 创建新的数据库会话来记录错误
             error_db = Session(engine)
@@ -276,7 +287,7 @@ async def run_dify_uploader(task_id: UUID, **kwargs) -> None:
             finally:
                 error_db.close()
         except Exception as e2:
-            logger.error(f"更新任务状态失败：{e2}")
+            logger.error("更新任务状态失败：%s", e2)
 
 
 @router.get(
@@ -309,24 +320,37 @@ async def get_dify_task_status(task_id: UUID, db: Session = Depends(get_db)) ->
     response_model=DifyTaskList,
 )
 async def list_dify_tasks(
-    skip: int = Query(0, description="跳过记录数"),
-    limit: int = Query(10, description="返回记录数"),
+    skip: int = Query(0, ge=0, description="跳过记录数"),
+    limit: int = Query(10, ge=1, le=200, description="返回记录数"),
     status: str = Query(None, description="按状态筛选"),
+    cursor: Optional[datetime] = Query(
+        None, description="分页游标，传入上一页返回的 next_cursor，提供时忽略 skip"
+    ),
+    cursor_id: Optional[UUID] = Query(
+        None, description="分页游标ID，传入上一页返回的 next_cursor_id"
+    ),
     db: Session = Depends(get_db),
 ) -> DifyTaskList:
     """获取Dify任务列表."""
-    query = select(DifyTask)
-
+    filters = []
     if status:
-        query = query.where(DifyTask.status == status)
+        filters.append(DifyTask.status == status)
 
-    # 获取总数
-    total_query = query
-    total = len(db.exec(total_query).all())
+    # 获取总数，使用 COUNT 查询避免加载全部记录
+    total = db.exec(select(func.count()).select_from(DifyTask).where(*filters)).one()
 
     # 分页查询
-    query = query.offset(skip).limit(limit).order_by(DifyTask.created_at.desc())
+    query = paginate_by_created(
+        select(DifyTask).where(*filters),
+        DifyTask.created_at,
+        DifyTask.id,
+        skip,
+        limit,
+        cursor,
+        cursor_id,
+    )
     tasks = db.exec(query).all()
+    has_more = len(tasks) == limit
 
     # 转换为响应模型
     task_statuses = [
@@ -351,6 +375,8 @@ async def list_dify_tasks(
         total=total,
         skip=skip,
         limit=limit,
+        next_cursor=tasks[-1].created_at if has_more else None,
+        next_cursor_id=tasks[-1].id if has_more else None,
     )
 
 
@@ -428,7 +454,7 @@ async def create_jira_itops(
 
         # 检查登录是否成功
         if login_response.status_code != 200:
-            logger.error(f"登录失败: {login_response.status_code}")
+            logger.error("登录失败: %s", login_response.status_code)
             return JiraITOPSResponse(
                 url="", message=f"登录失败，状态码: {login_response.status_code}", issue_key=""
             )
@@ -439,7 +465,7 @@ async def create_jira_itops(
         # 从cookies中提取token
         atl_token = cookies.get("atlassian.xsrf.token", "")
 
-        logger.info(f"登录成功，获取到的cookies: {cookies}, token: {atl_token}")
+        logger.info("登录成功，获取到的cookies: %s, token: %s", cookies, atl_token)
 
         # 第二步：创建工单
         create_url = f"{base_url}/secure/QuickCreateIssue.jspa?decorator=none"
@@ -504,10 +530,9 @@ async def create_jira_itops(
             create_url, headers=create_headers, data=encoded_data, verify=False
         )
 
-        logger.info(f"创建工单响应状态码: {create_response.status_code}")
-        logger.info(
-            f"创建工单响应内容: {create_response.text[:500]}"
-        )  # 只记录前500个字符，避免日志过大
+        logger.info("创建工单响应状态码: %s", create_response.status_code)
+        # 只记录前500个字符，避免日志过大
+        logger.info("创建工单响应内容: %s", create_response.text[:500])
 
         # 检查创建是否成功
         if create_response.status_code != 200:
@@ -527,7 +552,7 @@ async def create_jira_itops(
                 if match:
                     issue_key = match.group(1)
         except Exception as e:
-            logger.error(f"解析响应失败: {str(e)}")
+            logger.error("解析响应失败: %s", e)
             # 尝试从响应文本中提取issue key
             match = re.search(r'"issueKey":"([^"]+)"', create_response.text)
             if match:
@@ -545,5 +570,5 @@ async def create_jira_itops(
         )
 
     except Exception as e:
-        logger.error(f"创建JIRA ITOPS工单失败: {str(e)}")
+        logger.error("创建JIRA ITOPS工单失败: %s", e)
         return JiraITOPSResponse(url="", message=f"创建工单过程中发生错误: {str(e)}", issue_key="")
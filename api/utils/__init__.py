@@ -3,13 +3,27 @@ API 工具函数包
 """
 
 from .index import (
+    DOWNLOAD_RESPONSES,
+    ZIP_COMPRESSION,
+    ZSTD_LEVEL,
+    ZSTD_ARCHIVAL_LEVEL,
     create_streaming_zip_response,
     create_streaming_targz_response,
+    create_streaming_tarzst_response,
     validate_task_for_download,
+    spawn_background_task,
+    run_with_crawler_limit,
 )
 
 __all__ = [
+    "DOWNLOAD_RESPONSES",
+    "ZIP_COMPRESSION",
+    "ZSTD_LEVEL",
+    "ZSTD_ARCHIVAL_LEVEL",
     "create_streaming_zip_response",
     "create_streaming_targz_response",
+    "create_streaming_tarzst_response",
     "validate_task_for_download",
+    "spawn_background_task",
+    "run_with_crawler_limit",
 ]
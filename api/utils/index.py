@@ -3,155 +3,538 @@ API 工具函数
 """
 
 import os
-import io
+import zlib
 import zipfile
 import tarfile
 import asyncio
-import tempfile
-import concurrent.futures
 import logging
-from typing import Dict, Any, AsyncGenerator, Optional
+import time
+import threading
+import concurrent.futures
+from collections import deque
+from functools import lru_cache
+from typing import (
+    Dict, Any, AsyncGenerator, BinaryIO, Callable, Coroutine, List, NamedTuple, Optional, Set
+)
 from uuid import UUID
+from pathlib import Path
 from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
 from sqlmodel import Session
 
+from .zipstream import ZipStreamWriter
+
+# tar.gz 下载优先使用 isal 的 igzip(基于 ISA-L，压缩速度为 zlib 的数倍)，未安装时回退标准库 gzip
+try:
+    from isal import igzip as _gzip
+except ImportError:
+    import gzip as _gzip
+
+# 调整管道缓冲区大小只在 Linux 上可用
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# tar.zst 下载依赖 zstandard，未安装时该格式不可用
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # 配置日志
 logger = logging.getLogger("uvicorn")
 
+# 下载接口的 OpenAPI 响应声明，压缩包以二进制流返回
+_BINARY_CONTENT = {"schema": {"type": "string", "format": "binary"}}
+DOWNLOAD_RESPONSES = {
+    200: {
+        "description": "任务结果压缩包",
+        "content": {
+            "application/zip": _BINARY_CONTENT,
+            "application/gzip": _BINARY_CONTENT,
+            "application/zstd": _BINARY_CONTENT,
+        },
+    }
+}
+
+# 下载接口可选的 ZIP 压缩方式，store 不压缩，适合内网快速下载
+ZIP_COMPRESSION = {"store": zipfile.ZIP_STORED, "deflate": zipfile.ZIP_DEFLATED}
+
+# tar.zst 压缩级别：交互下载速度优先，归档下载(archival)压缩比优先
+ZSTD_LEVEL = 3
+ZSTD_ARCHIVAL_LEVEL = 12
+
+# 本身已经压缩过的文件格式，再做 DEFLATE 几乎没有收益，直接以 STORED 方式写入
+PRECOMPRESSED_EXTENSIONS = frozenset(
+    {
+        ".png", ".jpg", ".jpeg", ".gif", ".webp",
+        ".gz", ".tgz", ".zip", ".7z", ".rar", ".bz2", ".xz", ".zst",
+        ".pdf", ".docx", ".xlsx", ".pptx",
+        ".mp3", ".mp4",
+    }
+)
 
-async def create_streaming_zip_response(
-    task_dir: str,
-    zip_name: str,
-    task_id: UUID,
-    chunk_size: int = 1024 * 1024,  # 默认 1MB 块大小
-) -> StreamingResponse:
-    """
-    创建流式 ZIP 响应，用于大文件下载
+# 扩展名未知时，取文件开头的样本试压缩，压缩后仍不小于原大小的 95% 视为不可压缩，直接 STORED
+_ENTROPY_SAMPLE_SIZE = 4096
+_INCOMPRESSIBLE_RATIO = 0.95
 
-    Args:
-        task_dir: 要压缩的目录路径
-        zip_name: 下载文件名
-        task_id: 任务 ID
-        chunk_size: 分块大小，默认 1MB
+# 并行 DEFLATE 的线程数及单文件大小上限，超过上限的大文件在压缩线程中分块流式压缩，避免整体读入内存
+_DEFLATE_WORKERS = os.cpu_count() or 4
+_PARALLEL_DEFLATE_MAX_SIZE = 32 * 1024 * 1024
 
-    Returns:
-        StreamingResponse: 流式响应对象
+# 所有下载共享的并行压缩线程池，以及同时读入内存等待压缩或写出的文件总大小上限
+_DEFLATE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=_DEFLATE_WORKERS, thread_name_prefix="deflate"
+)
+_DEFLATE_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# 压缩专用线程池，长时间运行的压缩任务不占用默认线程池，避免阻塞其他接口的 to_thread 调用；
+# 超出线程数的下载排队等待。读取管道使用同样大小的独立线程池，保证每个运行中的压缩任务
+# 总有一个读取线程可用，不会因读写共用线程而互相等待
+_ARCHIVE_WORKERS = max(2, (os.cpu_count() or 4) // 2)
+_ARCHIVE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=_ARCHIVE_WORKERS, thread_name_prefix="archiver"
+)
+_ARCHIVE_READ_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=_ARCHIVE_WORKERS, thread_name_prefix="archive-reader"
+)
+
+# 压缩管道的缓冲区大小，Linux 默认只有 64KB，与默认块大小对齐后压缩线程不必频繁等待读取
+_PIPE_SIZE = 1024 * 1024
+
+# 每次从管道读取的块数，一次线程切换读取多个块，再在事件循环中按块大小切分返回
+_CHUNKS_PER_READ = 4
+
+# 传输进度日志间隔
+_LOG_INTERVAL_BYTES = 10 * 1024 * 1024
+
+# tar 打包时单次拷贝的块大小，tarfile 默认 16KB，加大后文件内容以更少、更大的块送入压缩器
+_TAR_COPY_BUFSIZE = 1024 * 1024
+
+
+class _FileEntry(NamedTuple):
+    """目录扫描得到的单个文件"""
+
+    path: str
+    arcname: str
+    size: int
+    mtime_ns: int
+    mode: int
+
+
+def _scan_dir(task_dir: str, prefix: str = "") -> List[_FileEntry]:
+    """递归扫描目录，返回所有文件的路径、压缩包内路径及 stat 信息.
+
+    一次扫描的结果同时用于大小预计算和压缩写入，不再重复遍历目录和 stat 文件。
+    """
+    entries = []
+    with os.scandir(task_dir) as it:
+        for entry in it:
+            arcname = prefix + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                entries.extend(_scan_dir(entry.path, arcname + "/"))
+            elif entry.is_file():
+                st = entry.stat()
+                entries.append(
+                    _FileEntry(entry.path, arcname, st.st_size, st.st_mtime_ns, st.st_mode)
+                )
+    return entries
+
+
+async def _scan_task_dir(task_dir: str) -> List[_FileEntry]:
+    """在线程中检查并扫描任务目录，目录不存在时返回 404.
+
+    存在性检查和目录遍历在同一次线程调用中完成，三种压缩格式共用，不在事件循环中做文件系统操作。
     """
-    if not os.path.exists(task_dir):
+
+    def scan() -> Optional[List[_FileEntry]]:
+        if not os.path.isdir(task_dir):
+            return None
+        return _scan_dir(task_dir)
+
+    entries = await asyncio.to_thread(scan)
+    if entries is None:
         raise HTTPException(status_code=404, detail="任务目录不存在，请重新建立任务")
+    return entries
 
-    logger.info(f"准备流式下载目录: {task_dir}, 任务ID: {task_id}")
 
-    # 预计算 ZIP 文件大小
-    async def calculate_zip_size():
-        total_size = 0
-        file_count = 0
+def _enlarge_pipe(fd: int) -> None:
+    """尽量将管道缓冲区扩大到 _PIPE_SIZE，不支持或超出系统上限时保持默认大小."""
+    if fcntl is None or not hasattr(fcntl, "F_SETPIPE_SZ"):
+        return
+    try:
+        fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, _PIPE_SIZE)
+    except OSError as e:
+        # 非特权进程受 /proc/sys/fs/pipe-max-size 限制
+        logger.debug("调整管道缓冲区大小失败，使用默认大小: %s", e)
 
-        # 收集所有文件信息
-        for root, _, files in os.walk(task_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_size = os.path.getsize(file_path)
-                total_size += file_size
-                file_count += 1
 
-        # ZIP 压缩后的大小估算 (压缩比约为 0.6-0.7，保守估计用 0.8)
-        estimated_zip_size = int(total_size * 0.8)
-        logger.info(
-            f"预计算完成: {file_count} 个文件, 原始大小: {total_size/1024/1024:.2f}MB, 估计ZIP大小: {estimated_zip_size/1024/1024:.2f}MB"
-        )
+def _stored_zip_size(entries: List[_FileEntry]) -> int:
+    """计算全部以 STORED 方式写入时 ZIP 文件的精确大小.
 
-        return estimated_zip_size, file_count
+    与 ZipStreamWriter.write_file 的输出一致(也与 zipfile 向不可 seek 的管道写入时相同)：
+    每个条目为本地文件头 + 文件数据 + 数据描述符，其后是中央目录和结束记录，
+    超出 ZIP64 限制的部分附加 ZIP64 扩展字段。
+    """
+    offset = 0
+    central_dir_size = 0
+    for entry in entries:
+        size = entry.size
+        name_len = len(entry.arcname.encode("utf-8"))
+        # zipfile 按 file_size * 1.05 是否超过限制决定本地文件头是否使用 ZIP64
+        local_zip64 = size * 1.05 > zipfile.ZIP64_LIMIT
+        local_size = 30 + name_len + (20 if local_zip64 else 0)
+        descriptor_size = 24 if local_zip64 else 16
+
+        zip64_fields = 0
+        if size > zipfile.ZIP64_LIMIT:
+            zip64_fields += 2
+        if offset > zipfile.ZIP64_LIMIT:
+            zip64_fields += 1
+        central_dir_size += 46 + name_len + (4 + 8 * zip64_fields if zip64_fields else 0)
+
+        offset += local_size + size + descriptor_size
+
+    end_size = 22
+    if (
+        len(entries) > zipfile.ZIP_FILECOUNT_LIMIT
+        or offset > zipfile.ZIP64_LIMIT
+        or central_dir_size > zipfile.ZIP64_LIMIT
+    ):
+        # ZIP64 结束记录及其定位器
+        end_size += 56 + 20
+    return offset + central_dir_size + end_size
+
+
+def _open_tar_writer(fileobj: BinaryIO) -> tarfile.TarFile:
+    """在压缩写入器之上打开 tar 打包器.
+
+    压缩写入器本身已做缓冲且只追加写入，使用普通写模式("w")让文件内容直接写入压缩器，
+    不经过流模式("w|")额外的 10KB 记录缓冲再拷贝一遍。
+    """
+    return tarfile.open(fileobj=fileobj, mode="w", copybufsize=_TAR_COPY_BUFSIZE)
 
-    # 计算估计大小
-    estimated_size, file_count = await calculate_zip_size()
 
-    # 创建流式响应生成器
-    async def zip_directory_stream() -> AsyncGenerator[bytes, None]:
-        """异步生成 ZIP 文件流"""
-        # 创建内存中的 ZIP 文件
-        zip_buffer = io.BytesIO()
+class _ArchiveAborted(Exception):
+    """客户端已断开，压缩线程停止生成压缩包."""
 
-        # 在线程池中执行 ZIP 压缩（避免阻塞事件循环）
-        def create_zip() -> io.BytesIO:
-            """在线程池中创建 ZIP 文件"""
-            logger.info(f"开始压缩目录: {task_dir}")
-            try:
-                with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-                    total_size = 0
 
-                    for root, _, files in os.walk(task_dir):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            arcname = os.path.relpath(file_path, task_dir)
+def _check_aborted(stop_event: threading.Event) -> None:
+    """下载已结束时中止压缩，在每个文件写入前调用."""
+    if stop_event.is_set():
+        raise _ArchiveAborted("客户端已断开")
 
-                            # 添加文件到 ZIP
-                            zf.write(file_path, arcname=arcname)
 
-                            # 统计信息
-                            total_size += os.path.getsize(file_path)
+def _add_files_to_tar(
+    tf: tarfile.TarFile, entries: List[_FileEntry], stop_event: threading.Event
+) -> None:
+    """将扫描得到的文件依次写入 tar 包，保留相对路径."""
+    for entry in entries:
+        _check_aborted(stop_event)
+        tf.add(entry.path, arcname=entry.arcname)
 
-                    logger.info(
-                        f"压缩完成: {file_count} 个文件, 总大小: {total_size/1024/1024:.2f}MB"
-                    )
 
-                # 重置缓冲区位置
-                zip_buffer.seek(0)
-                return zip_buffer
-            except Exception as e:
-                logger.error(f"创建 ZIP 文件失败: {str(e)}")
-                raise HTTPException(status_code=500, detail=f"创建 ZIP 文件失败: {str(e)}")
-
-        # 异步执行 ZIP 创建
-        loop = asyncio.get_event_loop()
-        buffer = await loop.run_in_executor(None, create_zip)
-        
-        # 获取实际大小
-        actual_size = buffer.getbuffer().nbytes
-        logger.info(f"ZIP 文件实际大小: {actual_size/1024/1024:.2f}MB")
-        
-        # 更新估计大小为实际大小
-        nonlocal estimated_size
-        estimated_size = actual_size
-
-        # 分块读取并返回
-        logger.info(f"开始流式传输 ZIP 文件, 块大小: {chunk_size/1024:.2f}KB")
-        bytes_sent = 0
-        start_time = asyncio.get_event_loop().time()
+class _ByteBudget:
+    """多个线程共享的字节预算，超出预算时申请方等待其他线程释放."""
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._used = 0
+        self._cond = threading.Condition()
+
+    def _fits(self, size: int) -> bool:
+        # 预算空闲时总是允许，单个文件超过预算也不会永久等待
+        return self._used == 0 or self._used + size <= self._limit
+
+    def try_acquire(self, size: int) -> bool:
+        with self._cond:
+            if not self._fits(size):
+                return False
+            self._used += size
+            return True
+
+    def acquire(self, size: int, stop_event: threading.Event) -> None:
+        """等待预算可用，等待期间下载结束时抛出 _ArchiveAborted."""
+        with self._cond:
+            while not self._fits(size):
+                self._cond.wait(timeout=0.5)
+                _check_aborted(stop_event)
+            self._used += size
+
+    def release(self, size: int) -> None:
+        with self._cond:
+            self._used -= size
+            self._cond.notify_all()
+
+
+_DEFLATE_BUDGET = _ByteBudget(_DEFLATE_MEMORY_BUDGET)
+
+
+def _is_incompressible(sample: bytes) -> bool:
+    """以最快级别试压缩样本，判断数据是否已经是压缩或加密过的高熵内容."""
+    if not sample:
+        return False
+    return len(zlib.compress(sample, 1)) >= len(sample) * _INCOMPRESSIBLE_RATIO
+
+
+@lru_cache(maxsize=4096)
+def _file_looks_incompressible(file_path: str, file_size: int, mtime_ns: int) -> bool:
+    """读取文件开头的样本判断是否不可压缩，重复下载同一目录时不再读取.
+
+    按 (路径, 大小, 修改时间) 缓存，文件被同样大小的新内容覆盖后会重新抽样。
+    """
+    with open(file_path, "rb") as f:
+        return _is_incompressible(f.read(_ENTROPY_SAMPLE_SIZE))
+
 
+def _deflate_file(file_path: str, compress_level: int) -> tuple:
+    """读取单个文件并压缩为原始 DEFLATE 流，返回 (压缩方式, CRC32, 原始大小, 条目数据).
+
+    文件开头的样本不可压缩时跳过压缩，以 STORED 方式返回原始数据。
+    zlib 压缩和 CRC 计算期间会释放 GIL，多个线程可以同时占用多个 CPU 核心。
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+    crc = zlib.crc32(data)
+    if _is_incompressible(data[:_ENTROPY_SAMPLE_SIZE]):
+        return zipfile.ZIP_STORED, crc, len(data), data
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    return zipfile.ZIP_DEFLATED, crc, len(data), compressed
+
+
+async def _stream_archive(
+    produce: Callable[[BinaryIO, threading.Event], int], chunk_size: int, label: str
+) -> AsyncGenerator[bytes, None]:
+    """在线程池中生成压缩包并经管道分块读出，边压缩边传输.
+
+    压缩线程写入管道，生成器从管道读取，内存占用不随压缩包大小增长。
+    客户端断开时设置停止事件并关闭读端，压缩线程在下一个文件前或下一次写入时退出，
+    仍在排队的压缩任务直接取消。
+
+    Args:
+        produce: 在线程中执行的压缩函数，接收管道写端和停止事件，返回原始数据总大小
+        chunk_size: 分块大小
+        label: 日志中的压缩包格式名称
+    """
+    read_size = chunk_size * _CHUNKS_PER_READ
+    read_fd, write_fd = os.pipe()
+    _enlarge_pipe(write_fd)
+    read_pipe = os.fdopen(read_fd, "rb", buffering=read_size)
+    write_pipe = os.fdopen(write_fd, "wb")
+
+    loop = asyncio.get_running_loop()
+    started = asyncio.Event()
+    stop_event = threading.Event()
+
+    def run_producer() -> int:
+        loop.call_soon_threadsafe(started.set)
+        try:
+            _check_aborted(stop_event)
+            return produce(write_pipe, stop_event)
+        finally:
+            # 关闭写端，读端随之读到 EOF；客户端断开时写端可能已失效，忽略关闭错误
+            try:
+                write_pipe.close()
+            except OSError:
+                pass
+
+    producer_future = _ARCHIVE_EXECUTOR.submit(run_producer)
+    producer = asyncio.wrap_future(producer_future)
+
+    # 分块读取并返回
+    logger.info("开始流式传输 %s 文件, 块大小: %.2fKB", label, chunk_size / 1024)
+    bytes_sent = 0
+    next_log = _LOG_INTERVAL_BYTES
+    start_time = time.monotonic()
+    producer_awaited = False
+
+    try:
+        # 压缩线程开始运行后才读取管道，排队中的下载不会占用读取线程
+        await started.wait()
         while True:
-            chunk = buffer.read(chunk_size)
-            if not chunk:
+            block = await loop.run_in_executor(_ARCHIVE_READ_EXECUTOR, read_pipe.read, read_size)
+            if not block:
                 break
 
-            bytes_sent += len(chunk)
-            yield chunk
+            for i in range(0, len(block), chunk_size):
+                yield block[i:i + chunk_size]
+            bytes_sent += len(block)
 
-            # 每 10MB 记录一次日志
-            if bytes_sent % (10 * 1024 * 1024) < chunk_size:
-                elapsed = asyncio.get_event_loop().time() - start_time
+            # 每跨过一个 10MB 阈值记录一次日志，只有到达阈值时才读取时钟
+            if bytes_sent >= next_log:
+                next_log = (bytes_sent // _LOG_INTERVAL_BYTES + 1) * _LOG_INTERVAL_BYTES
+                elapsed = time.monotonic() - start_time
                 speed = bytes_sent / (1024 * 1024 * elapsed) if elapsed > 0 else 0
-                logger.info(f"已传输: {bytes_sent/1024/1024:.2f}MB, 速度: {speed:.2f}MB/s")
+                logger.info("已传输(%s): %.2fMB, 速度: %.2fMB/s", label, bytes_sent / 1024 / 1024, speed)
+
+        # 压缩线程中的异常在这里抛出
+        producer_awaited = True
+        await producer
+    finally:
+        # 提前结束时通知压缩线程停止，压缩线程在下一个文件前或下一次写入时退出
+        stop_event.set()
+        cancelled = producer_future.cancel()
+        if cancelled:
+            # 仍在线程池中排队，run_producer 不会再运行，写端由这里关闭
+            write_pipe.close()
+            logger.info("%s 传输在压缩开始前结束，已取消压缩任务", label)
+
+        # 被取消的读取线程可能仍阻塞在 read 中并持有缓冲区锁，直到压缩线程关闭写端；
+        # 关闭读端会等待该锁，因此放到线程中执行，不阻塞事件循环
+        await asyncio.to_thread(read_pipe.close)
+
+        # 提前结束时等待压缩线程退出并取回其异常，即使它已先于这里结束
+        if not cancelled and not producer_awaited:
+            try:
+                await producer
+            except Exception as e:
+                logger.info("%s 传输提前结束，已停止压缩: %s", label, e)
 
-        # 记录总传输信息
-        total_time = asyncio.get_event_loop().time() - start_time
-        logger.info(
-            f"传输完成: 总大小 {bytes_sent/1024/1024:.2f}MB, "
-            f"耗时 {total_time:.2f}秒, "
-            f"平均速度 {bytes_sent/(1024*1024*total_time) if total_time > 0 else 0:.2f}MB/s"
-        )
+    # 记录总传输信息
+    total_time = time.monotonic() - start_time
+    logger.info(
+        "传输完成(%s): 总大小 %.2fMB, 耗时 %.2f秒, 平均速度 %.2fMB/s",
+        label,
+        bytes_sent / 1024 / 1024,
+        total_time,
+        bytes_sent / (1024 * 1024 * total_time) if total_time > 0 else 0,
+    )
+
+
+async def create_streaming_zip_response(
+    task_dir: str,
+    zip_name: str,
+    task_id: UUID,
+    chunk_size: int = 1024 * 1024,  # 默认 1MB 块大小
+    compression: int = zipfile.ZIP_DEFLATED,
+    compress_level: int = 1,
+) -> StreamingResponse:
+    """
+    创建流式 ZIP 响应，用于大文件下载
+
+    Args:
+        task_dir: 要压缩的目录路径
+        zip_name: 下载文件名
+        task_id: 任务 ID
+        chunk_size: 分块大小，默认 1MB
+        compression: ZIP 压缩方式，默认 ZIP_DEFLATED
+        compress_level: DEFLATE 压缩级别，默认 1，下载场景下速度优先于压缩比
+
+    Returns:
+        StreamingResponse: 流式响应对象
+    """
+    logger.info("准备流式下载目录: %s, 任务ID: %s", task_dir, task_id)
+
+    # 预计算目录大小，ZIP 压缩后的大小估算 (压缩比约为 0.6-0.7，保守估计用 0.8)
+    entries = await _scan_task_dir(task_dir)
+    file_count = len(entries)
+    raw_size = sum(entry.size for entry in entries)
+    logger.info(
+        "预计算完成: %s 个文件, 原始大小: %.2fMB, 估计ZIP大小: %.2fMB",
+        file_count,
+        raw_size / 1024 / 1024,
+        raw_size * 0.8 / 1024 / 1024,
+    )
+
+    def produce_zip(write_pipe: BinaryIO, stop_event: threading.Event) -> int:
+        """在线程池中压缩目录并写入管道"""
+        logger.info("开始压缩目录: %s", task_dir)
+        # 按顺序排队的并行压缩任务，每个下载最多同时保留 2 倍线程数个文件的压缩结果，
+        # 所有下载读入内存的文件总大小另受 _DEFLATE_BUDGET 限制
+        pending = deque()
+        max_pending = _DEFLATE_WORKERS * 2
+
+        def flush_pending(limit: int) -> None:
+            while len(pending) > limit:
+                entry, future = pending.popleft()
+                try:
+                    zw.write_entry(
+                        entry.arcname, entry.mtime_ns / 1e9, entry.mode, *future.result()
+                    )
+                finally:
+                    _DEFLATE_BUDGET.release(entry.size)
+
+        # 管道不可 seek，ZipStreamWriter 只追加写入
+        with ZipStreamWriter(write_pipe) as zw:
+            try:
+                for entry in entries:
+                    _check_aborted(stop_event)
+
+                    # 已压缩格式的文件不再重复压缩
+                    ext = os.path.splitext(entry.arcname)[1].lower()
+                    if ext in PRECOMPRESSED_EXTENSIONS:
+                        compress_type = zipfile.ZIP_STORED
+                    else:
+                        compress_type = compression
+
+                    # 中小文件交给线程池并行压缩，按提交顺序写入；
+                    # 预算不足时先写出自己排队的条目，再等待其他下载释放
+                    if (
+                        compress_type == zipfile.ZIP_DEFLATED
+                        and entry.size <= _PARALLEL_DEFLATE_MAX_SIZE
+                    ):
+                        if not _DEFLATE_BUDGET.try_acquire(entry.size):
+                            flush_pending(0)
+                            _DEFLATE_BUDGET.acquire(entry.size, stop_event)
+                        try:
+                            future = _DEFLATE_EXECUTOR.submit(
+                                _deflate_file, entry.path, compress_level
+                            )
+                        except BaseException:
+                            _DEFLATE_BUDGET.release(entry.size)
+                            raise
+                        pending.append((entry, future))
+                        flush_pending(max_pending)
+                        continue
+
+                    # 其余文件先等待排队的条目写完，再在当前线程中分块写入；
+                    # 大文件同样抽样判断，不可压缩时不做 DEFLATE
+                    flush_pending(0)
+                    if compress_type == zipfile.ZIP_DEFLATED and _file_looks_incompressible(
+                        entry.path, entry.size, entry.mtime_ns
+                    ):
+                        compress_type = zipfile.ZIP_STORED
+                    zw.write_file(
+                        entry.path,
+                        entry.arcname,
+                        entry.mtime_ns / 1e9,
+                        entry.mode,
+                        entry.size,
+                        compress_type,
+                        compress_level,
+                        lambda: _check_aborted(stop_event),
+                    )
+
+                flush_pending(0)
+            except BaseException:
+                # 中止时取消尚未开始的并行压缩任务，不再为已断开的下载压缩文件；
+                # 已在运行的任务完成后再归还预算
+                while pending:
+                    entry, future = pending.popleft()
+                    future.cancel()
+                    future.add_done_callback(
+                        lambda _, size=entry.size: _DEFLATE_BUDGET.release(size)
+                    )
+                raise
+
+        logger.info("压缩完成: %s 个文件, 总大小: %.2fMB", file_count, raw_size / 1024 / 1024)
+        return raw_size
 
-    # 返回流式响应，不包含 Content-Length 头
     headers = {
         "Content-Disposition": f'attachment; filename="{zip_name}"',
     }
-    
-    # 创建生成器
-    generator = zip_directory_stream()
-    
-    # 返回流式响应
-    return StreamingResponse(generator, media_type="application/zip", headers=headers)
+    # 不压缩时 ZIP 大小可以精确算出，提供 Content-Length 以便客户端显示进度；
+    # DEFLATE 压缩后的大小事先未知，仍以分块方式传输
+    if compression == zipfile.ZIP_STORED:
+        headers["Content-Length"] = str(_stored_zip_size(entries))
+
+    return StreamingResponse(
+        _stream_archive(produce_zip, chunk_size, "ZIP"),
+        media_type="application/zip",
+        headers=headers,
+    )
 
 
 async def create_streaming_targz_response(
@@ -159,6 +542,7 @@ async def create_streaming_targz_response(
     targz_name: str,
     task_id: UUID,
     chunk_size: int = 1024 * 1024,  # 默认 1MB 块大小
+    compress_level: int = 1,
 ) -> StreamingResponse:
     """
     创建流式 TAR.GZ 响应，用于大文件下载
@@ -174,141 +558,109 @@ async def create_streaming_targz_response(
         targz_name: 下载文件名
         task_id: 任务 ID
         chunk_size: 分块大小，默认 1MB
+        compress_level: gzip 压缩级别，默认 1，下载场景下速度优先于压缩比
 
     Returns:
         StreamingResponse: 流式响应对象
     """
-    if not os.path.exists(task_dir):
-        raise HTTPException(status_code=404, detail="任务目录不存在，请重新建立任务")
+    logger.info("准备流式下载目录(tar.gz): %s, 任务ID: %s", task_dir, task_id)
+
+    # 预计算目录大小，TAR.GZ 压缩后的大小估算 (压缩比约为 0.3-0.5，保守估计用 0.6)
+    entries = await _scan_task_dir(task_dir)
+    file_count = len(entries)
+    raw_size = sum(entry.size for entry in entries)
+    logger.info(
+        "预计算完成: %s 个文件, 原始大小: %.2fMB, 估计TAR.GZ大小: %.2fMB",
+        file_count,
+        raw_size / 1024 / 1024,
+        raw_size * 0.6 / 1024 / 1024,
+    )
+
+    def produce_targz(write_pipe: BinaryIO, stop_event: threading.Event) -> int:
+        """在线程池中打包目录，经 gzip 压缩后写入管道"""
+        logger.info("开始压缩目录(tar.gz): %s, gzip 实现: %s", task_dir, _gzip.__name__)
+        # tarfile 只负责打包，压缩交给 gzip 写入器，安装 isal 时使用 igzip 加速
+        with _gzip.open(write_pipe, "wb", compresslevel=compress_level) as gz:
+            with _open_tar_writer(gz) as tf:
+                _add_files_to_tar(tf, entries, stop_event)
 
-    logger.info(f"准备流式下载目录(tar.gz): {task_dir}, 任务ID: {task_id}")
+        logger.info(
+            "压缩完成(tar.gz): %s 个文件, 原始大小: %.2fMB", file_count, raw_size / 1024 / 1024
+        )
+        return raw_size
 
-    # 预计算 TAR.GZ 文件大小
-    async def calculate_targz_size():
-        total_size = 0
-        file_count = 0
+    # 返回流式响应，不包含 Content-Length 头
+    headers = {
+        "Content-Disposition": f'attachment; filename="{targz_name}"',
+    }
 
-        # 收集所有文件信息
-        for root, _, files in os.walk(task_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_size = os.path.getsize(file_path)
-                total_size += file_size
-                file_count += 1
+    return StreamingResponse(
+        _stream_archive(produce_targz, chunk_size, "tar.gz"),
+        media_type="application/gzip",
+        headers=headers,
+    )
 
-        # TAR.GZ 压缩后的大小估算 (压缩比约为 0.3-0.5，保守估计用 0.6)
-        estimated_targz_size = int(total_size * 0.6)
-        logger.info(
-            f"预计算完成: {file_count} 个文件, 原始大小: {total_size/1024/1024:.2f}MB, 估计TAR.GZ大小: {estimated_targz_size/1024/1024:.2f}MB"
-        )
 
-        return estimated_targz_size, file_count
-
-    # 计算估计大小和获取文件列表
-    estimated_size, file_count = await calculate_targz_size()
-
-    # 创建真正的流式响应生成器
-    async def real_streaming_targz() -> AsyncGenerator[bytes, None]:
-        """真正的流式 TAR.GZ 生成器，预先压缩然后流式传输"""
-        
-        # 创建临时文件
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        temp_path = temp_file.name
-        temp_file.close()
-        
-        logger.info(f"开始压缩目录到临时文件: {temp_path}")
-        start_time = asyncio.get_event_loop().time()
-        
-        # 在线程池中压缩目录
-        def compress_directory():
-            total_size = 0
-            with tarfile.open(temp_path, "w:gz", compresslevel=6) as tf:
-                # 添加目录中的所有文件，保留相对路径
-                for root, _, files in os.walk(task_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, task_dir)
-                        tf.add(file_path, arcname=arcname)
-                        
-                        # 统计信息
-                        file_size = os.path.getsize(file_path)
-                        total_size += file_size
-                        
-                        # 定期记录日志
-                        if total_size % (50 * 1024 * 1024) < file_size:  # 每 50MB 记录一次
-                            logger.info(f"已压缩(tar.gz): {total_size/1024/1024:.2f}MB")
-            
-            return total_size
-        
-        # 在线程池中执行压缩
-        loop = asyncio.get_event_loop()
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            total_size = await loop.run_in_executor(executor, compress_directory)
-        
-        # 记录压缩完成信息
-        compress_time = asyncio.get_event_loop().time() - start_time
-        compressed_size = os.path.getsize(temp_path)
+async def create_streaming_tarzst_response(
+    task_dir: str,
+    tarzst_name: str,
+    task_id: UUID,
+    chunk_size: int = 1024 * 1024,  # 默认 1MB 块大小
+    compress_level: int = ZSTD_LEVEL,
+) -> StreamingResponse:
+    """
+    创建流式 TAR.ZST 响应，用于大文件下载
+
+    zstd 使用多线程压缩，在多核机器上明显快于单线程的 ZIP 与 tar.gz。
+
+    Args:
+        task_dir: 要压缩的目录路径
+        tarzst_name: 下载文件名
+        task_id: 任务 ID
+        chunk_size: 分块大小，默认 1MB
+        compress_level: zstd 压缩级别，默认 3
+
+    Returns:
+        StreamingResponse: 流式响应对象
+    """
+    if zstandard is None:
+        raise HTTPException(status_code=400, detail="服务端未安装 zstandard，不支持 tar.zst 格式")
+
+    logger.info("准备流式下载目录(tar.zst): %s, 任务ID: %s", task_dir, task_id)
+
+    entries = await _scan_task_dir(task_dir)
+    file_count = len(entries)
+    raw_size = sum(entry.size for entry in entries)
+    logger.info("预计算完成: %s 个文件, 原始大小: %.2fMB", file_count, raw_size / 1024 / 1024)
+
+    def produce_tarzst(write_pipe: BinaryIO, stop_event: threading.Event) -> int:
+        """在线程池中打包目录，经 zstd 多线程压缩后写入管道"""
+        logger.info("开始压缩目录(tar.zst): %s, 压缩级别: %s", task_dir, compress_level)
+        cctx = zstandard.ZstdCompressor(level=compress_level, threads=-1)
+        # closefd=False: 写端由 _stream_archive 统一关闭
+        with cctx.stream_writer(write_pipe, closefd=False) as zw:
+            with _open_tar_writer(zw) as tf:
+                _add_files_to_tar(tf, entries, stop_event)
+
         logger.info(
-            f"压缩完成(tar.gz): {file_count} 个文件, 原始大小: {total_size/1024/1024:.2f}MB, "
-            f"压缩后大小: {compressed_size/1024/1024:.2f}MB, 耗时: {compress_time:.2f}秒, "
-            f"压缩比: {compressed_size/total_size*100:.2f}%, "
-            f"压缩速度: {total_size/(1024*1024*compress_time) if compress_time > 0 else 0:.2f}MB/s"
+            "压缩完成(tar.zst): %s 个文件, 原始大小: %.2fMB", file_count, raw_size / 1024 / 1024
         )
-        
-        # 流式传输临时文件
-        try:
-            bytes_sent = 0
-            transfer_start_time = asyncio.get_event_loop().time()
-            
-            with open(temp_path, "rb") as f:
-                while True:
-                    chunk = await loop.run_in_executor(None, f.read, chunk_size)
-                    if not chunk:
-                        break
-                    
-                    bytes_sent += len(chunk)
-                    yield chunk
-                    
-                    # 每 10MB 记录一次日志
-                    if bytes_sent % (10 * 1024 * 1024) < chunk_size:
-                        elapsed = asyncio.get_event_loop().time() - transfer_start_time
-                        speed = bytes_sent / (1024 * 1024 * elapsed) if elapsed > 0 else 0
-                        logger.info(
-                            f"已传输(tar.gz): {bytes_sent/1024/1024:.2f}MB, 速度: {speed:.2f}MB/s"
-                        )
-            
-            # 记录总传输信息
-            total_transfer_time = asyncio.get_event_loop().time() - transfer_start_time
-            logger.info(
-                f"传输完成(tar.gz): 总大小 {bytes_sent/1024/1024:.2f}MB, "
-                f"耗时 {total_transfer_time:.2f}秒, "
-                f"平均速度 {bytes_sent/(1024*1024*total_transfer_time) if total_transfer_time > 0 else 0:.2f}MB/s"
-            )
-            
-            # 记录整体完成信息
-            total_time = asyncio.get_event_loop().time() - start_time
-            logger.info(
-                f"下载完成(tar.gz): 总耗时 {total_time:.2f}秒, "
-                f"压缩耗时: {compress_time:.2f}秒, 传输耗时: {total_transfer_time:.2f}秒"
-            )
-        finally:
-            # 删除临时文件
-            try:
-                os.unlink(temp_path)
-                logger.info(f"已删除临时文件: {temp_path}")
-            except Exception as e:
-                logger.error(f"删除临时文件失败: {str(e)}")
+        return raw_size
 
     # 返回流式响应，不包含 Content-Length 头
     headers = {
-        "Content-Disposition": f'attachment; filename="{targz_name}"',
+        "Content-Disposition": f'attachment; filename="{tarzst_name}"',
     }
 
-    return StreamingResponse(real_streaming_targz(), media_type="application/gzip", headers=headers)
+    return StreamingResponse(
+        _stream_archive(produce_tarzst, chunk_size, "tar.zst"),
+        media_type="application/zstd",
+        headers=headers,
+    )
 
 
 async def validate_task_for_download(
-    task_id: UUID, db: Session, get_task_func: callable, temp_dir: str
+    task_id: UUID, db: Session, get_task_func: callable, temp_dir: Path
 ) -> Dict[str, Any]:
     """
     验证任务是否可以下载
@@ -334,10 +686,55 @@ async def validate_task_for_download(
         )
 
     # 检查源目录
-    task_dir = os.path.join(temp_dir, str(task_id))
-    logger.info(f"检查任务目录: {task_dir}")
+    task_dir = str(temp_dir / str(task_id))
+    logger.info("检查任务目录: %s", task_dir)
 
-    if not os.path.exists(task_dir):
+    if not await asyncio.to_thread(os.path.exists, task_dir):
         raise HTTPException(status_code=404, detail="任务目录不存在，请重新建立任务")
 
     return {"task_dir": task_dir, "task": task}
+
+
+# 后台任务的强引用集合，事件循环只保存任务的弱引用，未被引用的任务可能在执行中途被回收
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def spawn_background_task(coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+    """启动后台任务并保持引用，任务结束后自动释放.
+
+    Args:
+        coro: 要在后台执行的协程
+
+    Returns:
+        asyncio.Task: 已调度的任务对象
+    """
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+# 同时运行的爬虫子进程上限，超出的任务保持 pending 状态排队
+MAX_CRAWLERS = int(os.getenv("MAX_CRAWLERS", "4"))
+_crawler_semaphore = asyncio.Semaphore(MAX_CRAWLERS)
+
+
+async def run_with_crawler_limit(coro: Coroutine[Any, Any, Any]) -> Any:
+    """在爬虫并发上限内执行协程.
+
+    Args:
+        coro: 爬虫任务协程
+
+    Returns:
+        Any: 协程的返回值
+    """
+    queued_at = time.monotonic()
+    try:
+        async with _crawler_semaphore:
+            queue_wait_ms = (time.monotonic() - queued_at) * 1000
+            if queue_wait_ms >= 1:
+                logger.info("爬虫任务排队等待 %.0f ms", queue_wait_ms)
+            return await coro
+    finally:
+        # 排队期间被取消时协程从未启动，关闭它以免出现未等待的警告
+        coro.close()
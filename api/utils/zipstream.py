@@ -0,0 +1,329 @@
+"""
+向不可 seek 的流顺序写入 ZIP 文件
+
+按 PKWARE APPNOTE 自行写出本地文件头、数据描述符、中央目录和结束记录，
+不依赖 zipfile 的内部状态，因此可以直接写入在其他线程中预先压缩好的条目数据。
+"""
+
+import struct
+import time
+import zlib
+from typing import BinaryIO, Callable, List, NamedTuple, Optional
+
+# 压缩方式，与 zipfile.ZIP_STORED / zipfile.ZIP_DEFLATED 取值相同
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+# 超过该值的大小或偏移需要使用 ZIP64 扩展字段
+ZIP64_LIMIT = (1 << 31) - 1
+_ZIP_FILECOUNT_LIMIT = (1 << 16) - 1
+_UINT32_MAX = 0xFFFFFFFF
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_ZIP64_END_RECORD = struct.Struct("<4sQ2H2L4Q")
+_ZIP64_END_LOCATOR = struct.Struct("<4sLQL")
+
+_LOCAL_SIGNATURE = b"PK\x03\x04"
+_CENTRAL_SIGNATURE = b"PK\x01\x02"
+_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+_END_SIGNATURE = b"PK\x05\x06"
+_ZIP64_END_SIGNATURE = b"PK\x06\x06"
+_ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+
+# 通用标志位：大小和 CRC 写在数据描述符中 / 文件名使用 UTF-8 编码
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+# 解压所需版本：普通条目 2.0，ZIP64 条目 4.5；创建平台标记为 Unix，以便保存文件权限
+_VERSION_DEFAULT = 20
+_VERSION_ZIP64 = 45
+_CREATE_SYSTEM_UNIX = 3
+
+# 流式写入单个文件时每次读取的块大小
+_READ_SIZE = 1024 * 1024
+
+
+class _CentralEntry(NamedTuple):
+    """写入中央目录所需的条目信息"""
+
+    name: bytes
+    flags: int
+    compress_type: int
+    dos_time: int
+    dos_date: int
+    crc: int
+    compress_size: int
+    file_size: int
+    header_offset: int
+    external_attr: int
+    version: int
+
+
+def _dos_datetime(mtime: float) -> tuple:
+    """将修改时间转换为 ZIP 使用的 DOS 时间和日期，早于 1980 年的时间按 1980-01-01 记录"""
+    year, month, day, hour, minute, second = time.localtime(mtime)[:6]
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    dos_time = (hour << 11) | (minute << 5) | (second // 2)
+    dos_date = ((year - 1980) << 9) | (month << 5) | day
+    return dos_time, dos_date
+
+
+class ZipStreamWriter:
+    """顺序写入 ZIP 的写入器，只追加写入，不需要目标流支持 seek 或 tell
+
+    条目写入前大小和 CRC 已知时(write_entry)直接写在本地文件头中；
+    流式压缩的文件(write_file)在数据之后附加数据描述符。
+    """
+
+    def __init__(self, fileobj: BinaryIO):
+        self._fp = fileobj
+        self._offset = 0
+        self._entries: List[_CentralEntry] = []
+        self._closed = False
+
+    def __enter__(self) -> "ZipStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # 出错时不再写中央目录，写出一个不完整的压缩包让客户端能够察觉
+        if exc_type is None:
+            self.close()
+
+    def _write(self, data: bytes) -> None:
+        self._fp.write(data)
+        self._offset += len(data)
+
+    @staticmethod
+    def _encode_name(arcname: str) -> tuple:
+        """返回编码后的文件名及对应的标志位，非 ASCII 文件名以 UTF-8 编码并设置 UTF-8 标志"""
+        try:
+            return arcname.encode("ascii"), 0
+        except UnicodeEncodeError:
+            return arcname.encode("utf-8"), _FLAG_UTF8
+
+    def _write_local_header(
+        self,
+        name: bytes,
+        flags: int,
+        compress_type: int,
+        dos_time: int,
+        dos_date: int,
+        crc: int,
+        compress_size: int,
+        file_size: int,
+        zip64: bool,
+    ) -> None:
+        extra = b""
+        if zip64:
+            extra = struct.pack("<2H2Q", 1, 16, file_size, compress_size)
+            file_size = compress_size = _UINT32_MAX
+        self._write(
+            _LOCAL_HEADER.pack(
+                _LOCAL_SIGNATURE,
+                _VERSION_ZIP64 if zip64 else _VERSION_DEFAULT,
+                flags,
+                compress_type,
+                dos_time,
+                dos_date,
+                crc,
+                compress_size,
+                file_size,
+                len(name),
+                len(extra),
+            )
+            + name
+            + extra
+        )
+
+    def write_entry(
+        self,
+        arcname: str,
+        mtime: float,
+        mode: int,
+        compress_type: int,
+        crc: int,
+        file_size: int,
+        payload: bytes,
+    ) -> None:
+        """写入已准备好的条目数据(原始数据或原始 DEFLATE 流)
+
+        Args:
+            arcname: 压缩包内路径
+            mtime: 文件修改时间(秒)
+            mode: 文件的 st_mode，保存为 Unix 权限
+            compress_type: ZIP_STORED 或 ZIP_DEFLATED
+            crc: 原始数据的 CRC32
+            file_size: 原始数据大小
+            payload: 条目数据
+        """
+        name, flags = self._encode_name(arcname)
+        dos_time, dos_date = _dos_datetime(mtime)
+        compress_size = len(payload)
+        zip64 = file_size > ZIP64_LIMIT or compress_size > ZIP64_LIMIT
+        header_offset = self._offset
+
+        self._write_local_header(
+            name, flags, compress_type, dos_time, dos_date, crc, compress_size, file_size, zip64
+        )
+        self._write(payload)
+        self._entries.append(
+            _CentralEntry(
+                name, flags, compress_type, dos_time, dos_date, crc, compress_size,
+                file_size, header_offset, (mode & 0xFFFF) << 16,
+                _VERSION_ZIP64 if zip64 else _VERSION_DEFAULT,
+            )
+        )
+
+    def write_file(
+        self,
+        file_path: str,
+        arcname: str,
+        mtime: float,
+        mode: int,
+        file_size: int,
+        compress_type: int,
+        compress_level: int,
+        check_aborted: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """分块读取并压缩文件写入，不把整个文件读入内存
+
+        CRC 和压缩后大小在写完数据后才知道，记录在数据描述符中。
+        是否使用 ZIP64 按文件大小预先决定，压缩后可能略微变大，预留 5% 余量。
+
+        Args:
+            check_aborted: 每写入一块前调用，需要中止时抛出异常
+        """
+        name, flags = self._encode_name(arcname)
+        flags |= _FLAG_DATA_DESCRIPTOR
+        dos_time, dos_date = _dos_datetime(mtime)
+        zip64 = file_size * 1.05 > ZIP64_LIMIT
+        header_offset = self._offset
+
+        self._write_local_header(name, flags, compress_type, dos_time, dos_date, 0, 0, 0, zip64)
+
+        compressor = None
+        if compress_type == ZIP_DEFLATED:
+            compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+        crc = 0
+        read_size = 0
+        compress_size = 0
+        with open(file_path, "rb") as f:
+            while True:
+                if check_aborted is not None:
+                    check_aborted()
+                data = f.read(_READ_SIZE)
+                if not data:
+                    break
+                read_size += len(data)
+                crc = zlib.crc32(data, crc)
+                if compressor is not None:
+                    data = compressor.compress(data)
+                compress_size += len(data)
+                self._write(data)
+        if compressor is not None:
+            tail = compressor.flush()
+            compress_size += len(tail)
+            self._write(tail)
+
+        if not zip64 and (read_size > ZIP64_LIMIT or compress_size > ZIP64_LIMIT):
+            raise RuntimeError(f"文件在写入过程中变大，超出了 ZIP64 限制: {arcname}")
+
+        descriptor_format = "<4sLQQ" if zip64 else "<4sLLL"
+        self._write(
+            struct.pack(descriptor_format, _DESCRIPTOR_SIGNATURE, crc, compress_size, read_size)
+        )
+        self._entries.append(
+            _CentralEntry(
+                name, flags, compress_type, dos_time, dos_date, crc, compress_size,
+                read_size, header_offset, (mode & 0xFFFF) << 16,
+                _VERSION_ZIP64 if zip64 else _VERSION_DEFAULT,
+            )
+        )
+
+    def close(self) -> None:
+        """写出中央目录和结束记录，目标流由调用方负责关闭"""
+        if self._closed:
+            return
+        self._closed = True
+
+        central_dir_offset = self._offset
+        for entry in self._entries:
+            file_size = entry.file_size
+            compress_size = entry.compress_size
+            header_offset = entry.header_offset
+            # 与 zipfile 一致，任一大小超出限制时两个大小都写入 ZIP64 扩展字段
+            zip64_fields = []
+            if file_size > ZIP64_LIMIT or compress_size > ZIP64_LIMIT:
+                zip64_fields += [file_size, compress_size]
+                file_size = compress_size = _UINT32_MAX
+            if header_offset > ZIP64_LIMIT:
+                zip64_fields.append(header_offset)
+                header_offset = _UINT32_MAX
+
+            extra = b""
+            version = entry.version
+            if zip64_fields:
+                extra = struct.pack(
+                    f"<2H{len(zip64_fields)}Q", 1, 8 * len(zip64_fields), *zip64_fields
+                )
+                version = _VERSION_ZIP64
+
+            self._write(
+                _CENTRAL_HEADER.pack(
+                    _CENTRAL_SIGNATURE,
+                    (_CREATE_SYSTEM_UNIX << 8) | version,
+                    version,
+                    entry.flags,
+                    entry.compress_type,
+                    entry.dos_time,
+                    entry.dos_date,
+                    entry.crc,
+                    compress_size,
+                    file_size,
+                    len(entry.name),
+                    len(extra),
+                    0,
+                    0,
+                    0,
+                    entry.external_attr,
+                    header_offset,
+                )
+                + entry.name
+                + extra
+            )
+
+        central_dir_size = self._offset - central_dir_offset
+        count = len(self._entries)
+        if (
+            count > _ZIP_FILECOUNT_LIMIT
+            or central_dir_offset > ZIP64_LIMIT
+            or central_dir_size > ZIP64_LIMIT
+        ):
+            zip64_end_offset = self._offset
+            self._write(
+                _ZIP64_END_RECORD.pack(
+                    _ZIP64_END_SIGNATURE,
+                    _ZIP64_END_RECORD.size - 12,
+                    (_CREATE_SYSTEM_UNIX << 8) | _VERSION_ZIP64,
+                    _VERSION_ZIP64,
+                    0,
+                    0,
+                    count,
+                    count,
+                    central_dir_size,
+                    central_dir_offset,
+                )
+            )
+            self._write(_ZIP64_END_LOCATOR.pack(_ZIP64_LOCATOR_SIGNATURE, 0, zip64_end_offset, 1))
+            count = min(count, _ZIP_FILECOUNT_LIMIT)
+            central_dir_size = min(central_dir_size, _UINT32_MAX)
+            central_dir_offset = min(central_dir_offset, _UINT32_MAX)
+
+        self._write(
+            _END_RECORD.pack(
+                _END_SIGNATURE, 0, 0, count, count, central_dir_size, central_dir_offset, 0
+            )
+        )
@@ -1,8 +1,44 @@
+import os
 from typing import Dict, Any
+from functools import lru_cache
+from urllib.parse import urljoin, urlsplit
 from scrapy.http import Request, FormRequest
+from scrapy.downloadermiddlewares.httpcompression import ACCEPTED_ENCODINGS
 import base64
 from crawler.core.config import config
 
+# 需要按文件下载处理的附件扩展名
+_DOWNLOAD_EXTENSIONS = frozenset(
+    {".pdf", ".doc", ".docx", ".xls", ".xlsx", ".png", ".jpg", ".jpeg"}
+)
+
+
+def _url_extension(url: str) -> str:
+    """返回 URL 路径部分的小写文件扩展名，忽略查询参数"""
+    return os.path.splitext(urlsplit(url).path)[1].lower()
+
+
+@lru_cache(maxsize=1)
+def _base_auth_headers() -> Dict[str, str]:
+    """构建一次 Basic 认证请求头模板，认证信息在运行期间不变，无需每次请求重新编码"""
+    auth_str = f'Basic {base64.b64encode(f"{config.auth.basic_auth_user}:{config.auth.basic_auth_pass}".encode()).decode()}'
+    return {
+        "Authorization": auth_str,
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+        "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
+        # 声明 HttpCompressionMiddleware 能解压的全部编码(gzip/deflate，安装对应库时还有 br/zstd)
+        "Accept-Encoding": ", ".join(encoding.decode() for encoding in ACCEPTED_ENCODINGS),
+        "Connection": "keep-alive",
+        "Upgrade-Insecure-Requests": "1",
+        "User-Agent": config.spider.default_headers["User-Agent"],
+    }
+
+
+@lru_cache(maxsize=32)
+def _login_url(target_url: str) -> str:
+    """根据目标页面地址得到所在站点的登录地址，按目标地址缓存"""
+    return urljoin(target_url, "/dologin.action")
+
 
 class AuthManager:
     """认证管理器，处理所有与认证相关的逻辑 (简化版，利用 Scrapy 自动 cookie 管理)"""
@@ -13,22 +49,15 @@ class AuthManager:
         import logging
         self.logger = logging.getLogger(__name__)
         self.meta = meta
-        # 调用实例方法版本的create_login_request
-        self.login_request = self.create_login_request(meta)
+        # 登录请求由 Spider.start_requests 调用 create_login_request 创建，这里不再预先构建一个不会被发送的请求
 
     @staticmethod
     def get_auth_headers() -> Dict[str, str]:
-        """获取包含Basic认证的请求头 (简化版，不再手动处理 Cookie)"""
-        auth_str = f'Basic {base64.b64encode(f"{config.auth.basic_auth_user}:{config.auth.basic_auth_pass}".encode()).decode()}'
-        headers = {
-            "Authorization": auth_str,
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-            "User-Agent": config.spider.default_headers["User-Agent"],
-        }
-        return headers
+        """获取包含Basic认证的请求头 (简化版，不再手动处理 Cookie)
+
+        返回模板的副本，调用方可以自由修改。
+        """
+        return dict(_base_auth_headers())
 
     def create_login_request(self, meta, original_callback=None) -> FormRequest:
         """创建登录请求 (简化版，依赖 Scrapy 自动处理 Cookie)
@@ -45,7 +74,8 @@ class AuthManager:
             "login": "登录",
         }
         
-        login_url = target_url + "/dologin.action"
+        # 登录地址位于站点根路径，不能直接拼接在带路径和查询参数的页面地址之后
+        login_url = _login_url(target_url)
         self.logger.info(f"Creating login request to: {login_url}")
         
         # 直接构造登录请求，不再显式传递 cookies，Scrapy 会自动处理
@@ -110,16 +140,13 @@ class AuthManager:
         headers = AuthManager.get_auth_headers()
         
         # 为文件下载请求添加特殊处理
-        if any(ext in url.lower() for ext in ['.pdf', '.doc', '.docx', '.xls', '.xlsx', '.png', '.jpg', '.jpeg']):
+        if _url_extension(url) in _DOWNLOAD_EXTENSIONS:
             meta.update({
                 'handle_httpstatus_list': [200],
                 'dont_merge_cookies': False,  # 确保合并cookies
                 'download_file': True  # 标记这是一个文件下载请求
             })
-            headers.update({
-                'Accept': '*/*',
-                'Accept-Encoding': 'gzip, deflate'
-            })
+            headers['Accept'] = '*/*'
 
         return Request(
             url,
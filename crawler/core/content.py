@@ -1,27 +1,228 @@
+import io
 import os
+import posixpath
+import atexit
 import mimetypes
+import subprocess
+import tempfile
+import threading
 import urllib.parse
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 import logging
-from typing import List, Optional
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
 
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, SoupStrainer
 from PIL import Image
-from docx import Document
-from pptx import Presentation
+from lxml import etree
 import pytesseract
 from pdf2image import convert_from_path
 
 # 导入工具模块中的函数
 from crawler.utils import (
-    setup_magic_module, 
     detect_file_type, 
     safe_makedirs, 
-    safe_open, 
     ensure_long_path_support
 )
 
-# 设置magic模块
-magic = setup_magic_module()
+logger = logging.getLogger(__name__)
+
+# 安装 tesserocr 时在进程内调用 Tesseract，否则回退到 pytesseract 子进程
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# 进程内共享的 Tesseract API，中文语言模型只加载一次；API 非线程安全，调用需加锁
+_tess_api = None
+_tess_lock = threading.Lock()
+
+
+def _ocr_image(image: Image.Image) -> str:
+    """识别图片中的中文文本
+
+    先转为单通道灰度图再交给 Tesseract，像素数据只有 RGB 的三分之一，二值化由 Tesseract 完成。
+    """
+    global _tess_api
+    if image.mode != "L":
+        image = image.convert("L")
+    if tesserocr is None:
+        return pytesseract.image_to_string(image, lang="chi_sim")
+
+    with _tess_lock:
+        if _tess_api is None:
+            _tess_api = tesserocr.PyTessBaseAPI(lang="chi_sim")
+            atexit.register(_tess_api.End)
+        _tess_api.SetImage(image)
+        return _tess_api.GetUTF8Text()
+
+
+def _ocr_page(page_path: str) -> str:
+    """OCR进程池的工作函数，识别单个页面图片文件"""
+    with Image.open(page_path) as page:
+        return _ocr_image(page)
+
+
+@lru_cache(maxsize=1)
+def _ocr_executor() -> ProcessPoolExecutor:
+    """PDF页面OCR进程池，首次使用时创建
+
+    每个工作进程内的 Tesseract 限制为单线程，由进程池提供并行度，避免线程超额订阅。
+    """
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    atexit.register(executor.shutdown)
+    return executor
+
+
+# 附件下载使用的 Scrapy 下载槽名称，槽的并发与间隔在 Spider 的 DOWNLOAD_SLOTS 中配置
+ATTACHMENT_DOWNLOAD_SLOT = "kms-attachments"
+
+# PDF渲染分辨率，中文OCR在150DPI灰度图下已足够，像素量约为默认200DPI彩色图的六分之一
+_PDF_OCR_DPI = 150
+
+# PDF文本层超过该字符数时视为电子版PDF，直接使用文本层而不做OCR
+_PDF_TEXT_MIN_CHARS = 50
+
+
+def _pdf_text_layer(pdf_path: str) -> str:
+    """用 poppler 的 pdftotext 提取PDF自带的文本层，无法提取时返回空字符串"""
+    try:
+        result = subprocess.run(
+            ["pdftotext", "-enc", "UTF-8", pdf_path, "-"], capture_output=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.debug("PDF文本层提取失败，改用OCR: %s", e)
+        return ""
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+# Word 正文 XML 的命名空间及需要处理的节点
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_TEXT_TAGS = (f"{_W_NS}p", f"{_W_NS}t", f"{_W_NS}tab", f"{_W_NS}br", f"{_W_NS}cr")
+
+
+def _iter_docx_paragraphs(data: bytes):
+    """流式解析 word/document.xml，逐段产出正文段落文本，不构建 python-docx 对象模型
+
+    与 python-docx 的 Document.paragraphs 一致，只产出 w:body 下直接的段落；
+    表格单元格和文本框(w:txbxContent)中的段落有各自的段落栈，文本不计入正文。
+    """
+    with zipfile.ZipFile(io.BytesIO(data)) as zf, zf.open("word/document.xml") as f:
+        # 每个未结束的 w:p 一层，文本节点只归入最内层段落
+        stack = []
+        for event, el in etree.iterparse(f, events=("start", "end"), tag=_W_TEXT_TAGS):
+            if el.tag == f"{_W_NS}p":
+                if event == "start":
+                    stack.append([])
+                    continue
+                parts = stack.pop()
+                if el.getparent().tag == f"{_W_NS}body":
+                    yield "".join(parts)
+            elif event == "start" or not stack:
+                continue
+            elif el.tag == f"{_W_NS}t":
+                stack[-1].append(el.text or "")
+            elif el.getparent().tag != f"{_W_NS}r":
+                # 段落属性中的制表位定义等不属于正文
+                pass
+            elif el.tag == f"{_W_NS}tab":
+                stack[-1].append("\t")
+            else:
+                stack[-1].append("\n")
+            el.clear()
+
+
+# PPT 幻灯片 XML 中的文本节点(DrawingML)，以及确定幻灯片顺序所需的命名空间
+_A_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_A_TEXT_TAGS = (f"{_A_NS}p", f"{_A_NS}t", f"{_A_NS}br")
+_P_NS = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+_R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def _pptx_slide_names(zf: zipfile.ZipFile) -> List[str]:
+    """按演示文稿中的放映顺序返回幻灯片部件名
+
+    顺序以 ppt/presentation.xml 的 p:sldIdLst 为准，经 ppt/_rels/presentation.xml.rels
+    将关系ID解析为部件路径；幻灯片文件名中的编号不代表顺序，调整过顺序的文稿两者不一致。
+    """
+    with zf.open("ppt/_rels/presentation.xml.rels") as f:
+        targets = {
+            rel.get("Id"): rel.get("Target")
+            for rel in etree.parse(f).getroot().iter(f"{_PKG_REL_NS}Relationship")
+        }
+    with zf.open("ppt/presentation.xml") as f:
+        slide_ids = etree.parse(f).getroot().iterfind(f"{_P_NS}sldIdLst/{_P_NS}sldId")
+        names = []
+        for slide_id in slide_ids:
+            target = targets.get(slide_id.get(f"{_R_NS}id"))
+            if target is None:
+                continue
+            # Target 相对于 ppt/ 目录，以 / 开头时为包内绝对路径
+            if target.startswith("/"):
+                names.append(target.lstrip("/"))
+            else:
+                names.append(posixpath.normpath(posixpath.join("ppt", target)))
+    return names
+
+
+def _iter_pptx_paragraphs(data: bytes):
+    """按放映顺序流式解析各幻灯片 XML，逐段产出文本，不构建 python-pptx 对象模型"""
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        for name in _pptx_slide_names(zf):
+            with zf.open(name) as f:
+                parts = []
+                for _, el in etree.iterparse(f, events=("end",), tag=_A_TEXT_TAGS):
+                    if el.tag == f"{_A_NS}p":
+                        yield "".join(parts)
+                        parts.clear()
+                    elif el.tag == f"{_A_NS}t":
+                        parts.append(el.text or "")
+                    else:
+                        parts.append("\n")
+                    el.clear()
+
+
+# 页面只需要标题和正文两个节点，解析时跳过其余部分，不为整篇文档构建树
+_PAGE_STRAINER = SoupStrainer(id=["title-text", "main-content"])
+
+
+class ParsedPage(NamedTuple):
+    """页面解析结果，只包含不可变的字符串，可以在缓存中安全共享"""
+
+    title: str
+    content_html: str  # 格式化后的正文 HTML
+    attachment_links: Tuple[str, ...]  # 正文中附件的原始链接(img 的 src 或 a 的 href)
+
+
+@lru_cache(maxsize=128)
+def _parse_page(html_content: str) -> Optional[ParsedPage]:
+    """解析页面HTML并提取所需字符串，相同内容的页面(重试、重复访问)直接复用结果
+
+    缓存中不保留 bs4 节点，解析树在提取完成后即可释放。
+    """
+    soup = BeautifulSoup(html_content, "lxml", parse_only=_PAGE_STRAINER)
+    title_dom = soup.select_one("#title-text")
+    content_dom = soup.select_one("#main-content")
+    if not title_dom or not content_dom:
+        return None
+    attachment_links = tuple(
+        el.get("src" if el.name == "img" else "href", "")
+        for el in content_dom.select('[data-linked-resource-type="attachment"]')
+    )
+    return ParsedPage(title_dom.get_text(strip=True), content_dom.prettify(), attachment_links)
+
+
+@lru_cache(maxsize=1)
+def _excluded_extensions() -> frozenset:
+    """配置中排除的附件扩展名集合，首次使用时构建"""
+    from crawler.core.config import config
+
+    return frozenset(
+        ext.lower() for ext in config.spider.attachment_filters.get("excluded_extensions", [])
+    )
 
 from pydantic import BaseModel, Field
 
@@ -57,7 +258,7 @@ class ContentParser:
         self.enable_text_extraction = enable_text_extraction
         self.content_optimizer = content_optimizer
         self.auth_manager = auth_manager
-        self.logger = logging.getLogger(__name__)
+        self.logger = logger
         self._spider_callback = None  # 存储Spider提供的回调函数
 
     def set_callback(self, callback):
@@ -70,75 +271,92 @@ class ContentParser:
         self.logger.info("已设置Spider回调函数")
 
     @staticmethod
-    def parse_page_content(html_content: str) -> tuple[Tag, Tag]:
-        """解析页面内容，返回标题和正文"""
-        soup = BeautifulSoup(html_content, "html.parser")
-        titleDom = soup.select_one("#title-text")
-        contentDom = soup.select_one("#main-content")
-        return titleDom, contentDom
+    def parse_page_content(html_content: str) -> Optional[ParsedPage]:
+        """解析页面内容，返回标题、正文和附件链接，页面未完全加载时返回 None
+
+        使用 libxml2 实现的 lxml 解析器，并只保留标题和正文节点；结果按页面内容缓存。
+        """
+        return _parse_page(html_content)
 
     @staticmethod
-    def process_image(image_path: str) -> str:
-        """处理图片文件，提取文本"""
+    def process_image(data: bytes) -> str:
+        """处理图片文件内容，提取文本"""
         try:
-            image = Image.open(image_path)
-            return pytesseract.image_to_string(image, lang="chi_sim")
+            with Image.open(io.BytesIO(data)) as image:
+                return _ocr_image(image)
         except pytesseract.TesseractNotFoundError:
-            logging.error(
+            logger.error(
                 "Tesseract OCR未安装或未添加到PATH中。请参考README文件安装必要的系统依赖。"
             )
             return None
         except Exception as e:
-            logging.warning(f"图片文本提取失败: {str(e)}")
+            logger.warning("图片文本提取失败: %s", e)
             return None
 
     @staticmethod
-    def process_pdf(pdf_path: str) -> str:
-        """处理PDF文件，提取文本"""
+    def process_pdf(data: bytes) -> str:
+        """处理PDF文件内容，提取文本
+
+        电子版PDF直接读取自带的文本层；扫描件才把所有页面渲染为图片文件，
+        再分发到进程池并行识别，按页序拼接结果。
+        """
         try:
-            pages = convert_from_path(pdf_path)
-            text = ""
-            for page in pages:
-                text += pytesseract.image_to_string(page, lang="chi_sim")
-            return text
+            with tempfile.TemporaryDirectory() as tmpdir:
+                pdf_path = os.path.join(tmpdir, "source.pdf")
+                with open(pdf_path, "wb") as f:
+                    f.write(data)
+
+                text = _pdf_text_layer(pdf_path)
+                if len(text.strip()) > _PDF_TEXT_MIN_CHARS:
+                    return text
+
+                page_paths = convert_from_path(
+                    pdf_path,
+                    dpi=_PDF_OCR_DPI,
+                    output_folder=tmpdir,
+                    grayscale=True,
+                    paths_only=True,
+                    use_pdftocairo=True,
+                    thread_count=os.cpu_count() or 1,
+                )
+                if not page_paths:
+                    return ""
+
+                # 单页无需跨进程传递，直接在当前进程识别
+                if len(page_paths) == 1:
+                    return _ocr_page(page_paths[0])
+
+                return "".join(_ocr_executor().map(_ocr_page, page_paths))
         except (pytesseract.TesseractNotFoundError, Exception) as e:
-            logging.warning(f"PDF文本提取失败: {str(e)}")
+            logger.warning("PDF文本提取失败: %s", e)
             return None
 
     @staticmethod
-    def process_word(docx_path: str) -> str:
-        """处理Word文件，提取文本"""
+    def process_word(data: bytes) -> str:
+        """处理Word文件内容，提取文本"""
         try:
-            doc = Document(docx_path)
-            return "\n".join([paragraph.text for paragraph in doc.paragraphs])
+            return "\n".join(_iter_docx_paragraphs(data))
         except Exception as e:
-            logging.warning(f"Word文本提取失败: {str(e)}")
+            logger.warning("Word文本提取失败: %s", e)
             return None
 
     @staticmethod
-    def process_ppt(pptx_path: str) -> str:
-        """处理PPT文件，提取文本"""
+    def process_ppt(data: bytes) -> str:
+        """处理PPT文件内容，提取文本"""
         try:
-            prs = Presentation(pptx_path)
-            text = []
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    if hasattr(shape, "text"):
-                        text.append(shape.text)
-            return "\n".join(text)
+            return "\n".join(_iter_pptx_paragraphs(data))
         except Exception as e:
-            logging.warning(f"PPT文本提取失败: {str(e)}")
+            logger.warning("PPT文本提取失败: %s", e)
             return None
 
     def handle_downloaded_file(self, response):
         """处理下载完成的文件响应"""
-        self.logger.info(f"收到文件下载响应: {response.url}, 状态码: {response.status}")
+        self.logger.info("收到文件下载响应: %s, 状态码: %s", response.url, response.status)
 
         if response.status != 200:
-            self.logger.error(f"附件下载失败: {response.url}, 状态码: {response.status}")
+            self.logger.error("附件下载失败: %s, 状态码: %s", response.url, response.status)
             return None
 
-        temp_path = None
         try:
             # 处理文件名
             file_name = os.path.basename(response.url).split("?")[0]
@@ -151,11 +369,20 @@ class ContentParser:
                 if ext:
                     file_name = f"{file_name}{ext}"
 
-            # 创建临时文件
-            temp_path = f"temp_{file_name}"
-            # 使用安全的文件操作函数
-            with safe_open(temp_path, "wb") as f:
-                f.write(response.body)
+            # 检查是否需要过滤此附件，先检查文件大小，超限的附件无需再检测类型
+            attachment_filters = response.meta.get("attachment_filters")
+            filters_enabled = bool(attachment_filters and attachment_filters.get("enabled", False))
+            if filters_enabled:
+                max_size_mb = attachment_filters.get("max_size_mb", 50)
+                file_size_mb = len(response.body) / (1024 * 1024)  # 转换为MB
+                if file_size_mb > max_size_mb:
+                    self.logger.info(
+                        "附件 %s 因大小 %.2fMB 超过限制 %sMB 被过滤",
+                        file_name,
+                        file_size_mb,
+                        max_size_mb,
+                    )
+                    return None
 
             # 使用工具函数检测文件类型
             file_type = detect_file_type(
@@ -164,22 +391,11 @@ class ContentParser:
                 headers=response.headers
             )
 
-            # 检查是否需要过滤此附件（基于实际MIME类型和文件大小）
-            attachment_filters = response.meta.get("attachment_filters")
-            if attachment_filters and attachment_filters.get("enabled", False):
-                # 检查MIME类型
+            # 检查MIME类型
+            if filters_enabled:
                 excluded_mime_types = attachment_filters.get("excluded_mime_types", [])
                 if any(file_type.startswith(excluded) for excluded in excluded_mime_types):
-                    self.logger.info(f"附件 {file_name} 因实际MIME类型 {file_type} 被过滤")
-                    return None
-
-                # 检查文件大小
-                max_size_mb = attachment_filters.get("max_size_mb", 50)
-                file_size_mb = len(response.body) / (1024 * 1024)  # 转换为MB
-                if file_size_mb > max_size_mb:
-                    self.logger.info(
-                        f"附件 {file_name} 因大小 {file_size_mb:.2f}MB 超过限制 {max_size_mb}MB 被过滤"
-                    )
+                    self.logger.info("附件 %s 因实际MIME类型 %s 被过滤", file_name, file_type)
                     return None
 
             # 处理文本提取
@@ -187,19 +403,19 @@ class ContentParser:
             if self.enable_text_extraction:
                 try:
                     if file_type and "image" in file_type:
-                        text = self.process_image(temp_path)
+                        text = self.process_image(response.body)
                     elif file_type and "pdf" in file_type:
-                        text = self.process_pdf(temp_path)
+                        text = self.process_pdf(response.body)
                     elif file_type and ("word" in file_type or file_name.endswith('.docx')):
-                        text = self.process_word(temp_path)
+                        text = self.process_word(response.body)
                     elif file_type and ("powerpoint" in file_type or file_name.endswith('.pptx')):
-                        text = self.process_ppt(temp_path)
+                        text = self.process_ppt(response.body)
 
                     if text and self.content_optimizer:
                         text = self.content_optimizer.optimize(content=text, spiderUrl=response.url, )
                         file_type = "text/markdown"
                 except Exception as e:
-                    self.logger.error(f"文本提取失败: {str(e)}")
+                    self.logger.error("文本提取失败: %s", e)
 
             result = {
                 "url": response.url,
@@ -209,20 +425,13 @@ class ContentParser:
                 "extracted_text": text,
             }
 
-            self.logger.info(f"附件处理完成: {file_name}")
+            self.logger.info("附件处理完成: %s", file_name)
             return result
 
         except Exception as e:
-            self.logger.error(f"附件处理失败: {str(e)}")
+            self.logger.error("附件处理失败: %s", e)
             return None
 
-        finally:
-            if temp_path and os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                except OSError as e:
-                    self.logger.error(f"清理临时文件失败: {str(e)}")
-
     def process_attachment(self, file_url: str):
         """处理附件
 
@@ -236,21 +445,17 @@ class ContentParser:
             self.logger.error("未提供auth_manager，无法处理附件下载")
             return None
 
-        self.logger.info(f"开始处理附件下载: {file_url}")
-
-        # 检查是否需要过滤此附件
+        # 检查是否需要过滤此附件，被过滤的附件不创建请求
         from crawler.core.config import config
 
         if config.spider.attachment_filters.get("enabled", False):
             # 1. 检查文件扩展名
-            file_name = os.path.basename(file_url).split("?")[0]
-            file_name = urllib.parse.unquote(file_name)
+            file_name = urllib.parse.unquote(os.path.basename(urllib.parse.urlsplit(file_url).path))
             file_ext = os.path.splitext(file_name)[1].lower()
 
             # 检查扩展名过滤
-            excluded_extensions = config.spider.attachment_filters.get("excluded_extensions", [])
-            if file_ext in excluded_extensions:
-                self.logger.info(f"附件 {file_name} 因扩展名 {file_ext} 被过滤")
+            if file_ext in _excluded_extensions():
+                self.logger.info("附件 %s 因扩展名 %s 被过滤", file_name, file_ext)
                 return None
 
             # 2. 检查URL中的MIME类型提示（如果有）
@@ -263,9 +468,11 @@ class ContentParser:
             # 如果URL中有MIME类型提示，检查是否在排除列表中
             excluded_mime_types = config.spider.attachment_filters.get("excluded_mime_types", [])
             if mime_hint and any(excluded in mime_hint.lower() for excluded in excluded_mime_types):
-                self.logger.info(f"附件 {file_name} 因MIME类型提示 {mime_hint} 被过滤")
+                self.logger.info("附件 %s 因MIME类型提示 %s 被过滤", file_name, mime_hint)
                 return None
 
+        self.logger.info("开始处理附件下载: %s", file_url)
+
         # 创建下载请求
         request = self.auth_manager.create_authenticated_request(
             url=file_url,
@@ -277,6 +484,8 @@ class ContentParser:
                 "dont_retry": False,
                 "dont_merge_cookies": False,
                 "is_attachment": True,  # 标记这是附件下载请求
+                # 附件走独立的下载槽，不受页面抓取的下载间隔限制
+                "download_slot": ATTACHMENT_DOWNLOAD_SLOT,
                 "attachment_filters": (
                     config.spider.attachment_filters
                     if config.spider.attachment_filters.get("enabled", False)
@@ -1,11 +1,21 @@
 import os
 import re
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Any
 from crawler.core.content import KMSItem
 from crawler.core.config import config
 from crawler.utils import safe_makedirs, safe_open
 
+# 附件写盘线程池，同一页面的多个附件并行写入，写盘期间释放 GIL
+_WRITE_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="kms-export")
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    """以二进制方式写入文件"""
+    with safe_open(path, "wb") as f:
+        f.write(data)
+
 
 class DocumentExporter:
     """文档导出器，负责将KMSItem对象导出为Markdown文件"""
@@ -60,11 +70,15 @@ class DocumentExporter:
     ) -> List[Dict[str, str]]:
         """保存爬虫页面对应的附件文件并返回附件信息列表"""
         saved_attachments = []
+        # 待写入的 路径 -> 内容，收集完后交给线程池并行写盘；
+        # 同一路径(如 .txt 附件与其提取文本)只保留最后一次写入的内容，与顺序写入结果一致
+        pending_writes = {}
         for attachment in attachments:
             # 保存原始附件
             attachment_path = os.path.join(attachments_dir, attachment["filename"])
-            with safe_open(attachment_path, "wb") as f:
-                f.write(attachment["content"])
+            # 已写入磁盘并释放了二进制内容的附件不再重复写入
+            if attachment.get("content") is not None:
+                pending_writes[attachment_path] = attachment["content"]
             # 如果有提取的文本内容，保存为文本格式的文件
             if attachment.get("extracted_text"):
                 base_name = os.path.splitext(attachment["filename"])[0]
@@ -79,8 +93,7 @@ class DocumentExporter:
                     base_name = f"{base_name}.txt"
 
                 text_path = os.path.join(attachments_dir, base_name)
-                with safe_open(text_path, "w", encoding="utf-8") as f:
-                    f.write(attachment["extracted_text"])
+                pending_writes[text_path] = attachment["extracted_text"].encode("utf-8")
                 saved_attachments.append(
                     {
                         "filename": attachment["filename"],
@@ -92,6 +105,12 @@ class DocumentExporter:
                 saved_attachments.append(
                     {"filename": attachment["filename"], "path": attachment_path}
                 )
+
+        # 等待全部写入完成，写入失败时在此抛出异常
+        for future in [
+            _WRITE_EXECUTOR.submit(_write_bytes, path, data) for path, data in pending_writes.items()
+        ]:
+            future.result()
         return saved_attachments
 
     def _build_markdown_content(
@@ -133,7 +152,6 @@ class DocumentExporter:
         markdown_content = self._build_markdown_content(item, attachments_info, safe_title)
         markdown_path = os.path.join(markdown_dir, f"{safe_title}.md")
 
-        with safe_open(markdown_path, "w", encoding="utf-8") as f:
-            f.write(markdown_content)
+        _write_bytes(markdown_path, markdown_content.encode("utf-8"))
 
         return markdown_path, attachments_dir
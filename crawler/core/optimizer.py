@@ -6,10 +6,22 @@ import requests
 import logging
 import html2text
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, Generator, Dict, Any, Union
+from requests.adapters import HTTPAdapter
 from crawler.core.config import config
 
 
+@lru_cache(maxsize=1)
+def _http_session() -> requests.Session:
+    """各优化器共享的HTTP会话，复用到模型API的 keep-alive 连接，避免每个页面重新握手"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 class ContentOptimizer(ABC):
     """内容优化器的抽象基类"""
 
@@ -173,7 +185,7 @@ class OpenAICompatibleAdapter:
         }
 
         try:
-            response = requests.post(self.api_url, headers=self.headers, json=data, stream=stream)
+            response = _http_session().post(self.api_url, headers=self.headers, json=data, stream=stream)
             response.raise_for_status()
             return self.process_response(response, stream)
         except Exception as e:
@@ -255,7 +267,7 @@ class BaichuanOptimizer(ContentOptimizer):
         }
 
         try:
-            response = requests.post(self.api_url, headers=headers, json=data)
+            response = _http_session().post(self.api_url, headers=headers, json=data)
             response.raise_for_status()
             result = response.json()
             return result["choices"][0]["message"]["content"]
@@ -306,7 +318,7 @@ class XunfeiOptimizer(ContentOptimizer):
         }
 
         try:
-            response = requests.post(self.api_url, headers=headers, json=data, stream=stream)
+            response = _http_session().post(self.api_url, headers=headers, json=data, stream=stream)
             response.raise_for_status()
 
             if stream:
@@ -4,7 +4,7 @@ from datetime import datetime
 
 from crawler.core.auth import AuthManager
 from crawler.core.config import config
-from crawler.core.content import ContentParser, KMSItem
+from crawler.core.content import ATTACHMENT_DOWNLOAD_SLOT, ContentParser, KMSItem
 from crawler.core.exporter import DocumentExporter
 from crawler.core.optimizer import OptimizerFactory
 from crawler.core.tree_extractor import TreeExtractor
@@ -15,10 +15,19 @@ class ConfluenceSpider(scrapy.Spider):
     custom_settings = {
         "DOWNLOAD_DELAY": config.spider.download_delay,
         "COOKIES_ENABLED": True,
+        # 页面 HTML 以压缩方式传输，由 HttpCompressionMiddleware 透明解压
+        "COMPRESSION_ENABLED": True,
         "CONCURRENT_REQUESTS": config.spider.concurrent_requests,
         "RETRY_TIMES": config.spider.retry_times,
         "RETRY_HTTP_CODES": config.spider.retry_http_codes,
         "DEFAULT_REQUEST_HEADERS": config.spider.default_headers,
+        # 同一页面的附件并行下载，无需像页面请求一样逐个等待下载间隔
+        "DOWNLOAD_SLOTS": {
+            ATTACHMENT_DOWNLOAD_SLOT: {
+                "concurrency": config.spider.concurrent_requests,
+                "delay": 0,
+            },
+        },
     }
 
     def __init__(self, *args, **kwargs):
@@ -110,11 +119,11 @@ class ConfluenceSpider(scrapy.Spider):
 
     def parse_content(self, response):
         # 解析页面内容
-        title_element, main_element = self.content_parser.parse_page_content(response.text)
+        page = self.content_parser.parse_page_content(response.text)
         # 检查页面是否已完全加载
         retry_count = response.meta.get("retry_count", 0)
         max_retries = 3  # 最大重试次数
-        if not title_element or not main_element:
+        if page is None:
             if retry_count < max_retries:
                 self.logger.info(f"页面内容未完全加载，第{retry_count + 1}次重试")
                 meta = response.meta.copy()
@@ -131,18 +140,14 @@ class ConfluenceSpider(scrapy.Spider):
             return
 
         # 处理页面内容
-        title = title_element.get_text(strip=True)
+        title = page.title
         # 处理附件
         attachments = []
         pending_downloads = []
 
         # 获取页面中的所有附件链接
-        for attachment in main_element.select('[data-linked-resource-type="attachment"]'):
-            file_url = None
-            if attachment.name == "img":
-                file_url = response.urljoin(attachment.get("src", ""))
-            else:  # a标签
-                file_url = response.urljoin(attachment.get("href", ""))
+        for link in page.attachment_links:
+            file_url = response.urljoin(link)
 
             if not file_url:
                 continue
@@ -155,7 +160,7 @@ class ConfluenceSpider(scrapy.Spider):
                     {
                         "current_attachments": attachments,
                         "current_title": title,
-                        "current_content": main_element.prettify(),
+                        "current_content": page.content_html,
                         "depth_info": response.meta.get("depth_info", {}),
                         "original_response": response,
                     }
@@ -171,7 +176,7 @@ class ConfluenceSpider(scrapy.Spider):
         # 使用自定义适配器优化内容,添加当前爬虫的完整路径
         spiderUrl = response.url
         optimized_content = self.optimize_content(
-            content=main_element.prettify(), spiderUrl=spiderUrl, title=title
+            content=page.content_html, spiderUrl=spiderUrl, title=title
         )
 
         # 创建KMSItem对象，包含深度信息
@@ -237,6 +242,10 @@ class ConfluenceSpider(scrapy.Spider):
         exporter = DocumentExporter()
         markdown_path, attachments_dir = exporter.export(kms_item)
 
+        # 附件已写入磁盘，释放其二进制内容；同一页面后续附件完成时的导出不再重复写入
+        for attachment in attachments:
+            attachment.pop("content", None)
+
         self.logger.info(f"已保存文档：{markdown_path}")
         self.logger.info(f"附件保存在：{attachments_dir}" if attachments else "无附件")
 
@@ -112,9 +112,11 @@ def main():
 
         # 检查并清理旧的输出文件
         json_file = f"{output_dir}/{ConfluenceSpider.name}.json"
-        if os.path.exists(json_file):
-            logger.info(f"删除旧的输出文件: {json_file}")
+        try:
             os.remove(json_file)
+            logger.info(f"删除旧的输出文件: {json_file}")
+        except FileNotFoundError:
+            pass
 
         # 创建输出目录
         safe_makedirs(output_dir, exist_ok=True)  # 使用安全的目录创建函数
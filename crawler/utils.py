@@ -7,6 +7,8 @@ import sys
 import platform
 import ctypes
 import logging
+import mimetypes
+from functools import lru_cache
 from typing import Optional, Any, Callable
 
 # 设置日志记录器
@@ -14,6 +16,9 @@ logger = logging.getLogger(__name__)
 
 # ===== 文件类型检测相关函数 =====
 
+# libmagic 判断类型只需要文件头部，OOXML(docx/pptx)的特征在 ZIP 前几个条目内
+MAGIC_SNIFF_BYTES = 16 * 1024
+
 def setup_magic_module():
     """
     智能设置和加载magic模块，处理跨平台兼容性
@@ -74,6 +79,15 @@ def setup_magic_module():
             logger.error("在非Windows系统上无法导入magic库，请安装libmagic")
             raise
 
+@lru_cache(maxsize=1)
+def _mime_detector() -> Callable[[bytes], str]:
+    """返回MIME检测函数，libmagic 数据库只在首次使用时加载一次"""
+    magic_module = setup_magic_module()
+    if hasattr(magic_module, 'Magic'):
+        # Magic 实例内部持有已打开的 magic cookie，并自带锁保证线程安全
+        return magic_module.Magic(mime=True).from_buffer
+    return lambda buffer: magic_module.from_buffer(buffer, mime=True)
+
 def detect_file_type(file_content: bytes, file_name: str = "", headers: dict = None) -> str:
     """
     智能检测文件类型，跨平台兼容
@@ -86,13 +100,15 @@ def detect_file_type(file_content: bytes, file_name: str = "", headers: dict = N
     Returns:
         文件MIME类型
     """
-    import mimetypes
-    
+    # 文件名带有已知扩展名时直接按扩展名判断，无需 libmagic 扫描内容
+    if file_name:
+        file_type, _ = mimetypes.guess_type(file_name)
+        if file_type:
+            return file_type
+
     # 尝试使用magic库
     try:
-        magic_module = setup_magic_module()
-        if hasattr(magic_module, 'from_buffer') and callable(magic_module.from_buffer):
-            return magic_module.from_buffer(file_content, mime=True)
+        return _mime_detector()(file_content[:MAGIC_SNIFF_BYTES])
     except Exception as e:
         logger.warning(f"使用magic检测文件类型失败: {str(e)}")
     
@@ -102,12 +118,6 @@ def detect_file_type(file_content: bytes, file_name: str = "", headers: dict = N
         if content_type and content_type != "application/octet-stream":
             return content_type
     
-    # 备选方案：使用文件扩展名
-    if file_name:
-        file_type, _ = mimetypes.guess_type(file_name)
-        if file_type:
-            return file_type
-    
     # 默认返回
     return "application/octet-stream"
 
@@ -11,11 +11,8 @@ from datetime import datetime
 from pathlib import Path
 
 from dify import DifyClient, DatasetManager
+# 导入 dify.config 时已载入环境变量
 from dify.config import API_KEY, BASE_URL, DEFAULT_INPUT_DIR, SUPPORTED_FILE_EXTENSIONS, DATASET_NAME_PREFIX, MAX_DOCS_PER_DATASET
-from dotenv import load_dotenv
-
-# 载入环境变量
-load_dotenv()
 
 # 配置日志
 def setup_logging():
@@ -23,6 +23,9 @@ class AuthManager:
 
         # 设置Basic认证
         self._headers["Authorization"] = f"Basic {config.auth.basic_auth}"
+
+        # 序列化后的Cookie请求头，只在Cookie变化时重新生成
+        self._cookie_header = self._build_cookie_header(self.cookies)
         logger.debug("AuthManager initialized with default headers")
 
     @property
@@ -48,21 +51,28 @@ class AuthManager:
             Dict[str, str]: 当前的请求头字典
         """
         headers = self._headers.copy()
-
-        # 获取当前cookies
-        cookies = self.cookies
-        if cookies:
-            # 使用quote对cookie值进行编码，处理特殊字符
-            cookie_str = "; ".join(
-                f"{k}={quote(v)}" for k, v in cookies.items()
-                if v is not None and v != ""
-            )
-            if cookie_str:
-                headers["Cookie"] = cookie_str
-                logger.debug(f"Cookie header set: {cookie_str}")
+        if self._cookie_header:
+            headers["Cookie"] = self._cookie_header
 
         return headers
 
+    @staticmethod
+    def _build_cookie_header(cookies: Dict[str, str]) -> str:
+        """
+        将Cookie字典序列化为Cookie请求头
+
+        Args:
+            cookies: Cookie字典
+
+        Returns:
+            str: Cookie请求头的值，没有有效Cookie时为空字符串
+        """
+        # 使用quote对cookie值进行编码，处理特殊字符
+        return "; ".join(
+            f"{k}={quote(v)}" for k, v in cookies.items()
+            if v is not None and v != ""
+        )
+
     def update_cookies(self, new_cookies: Dict[str, str]):
         """
         更新Cookie
@@ -74,7 +84,9 @@ class AuthManager:
         self._cookies.update(
             {k: v for k, v in new_cookies.items() if v is not None and v != ""}
         )
+        self._cookie_header = self._build_cookie_header(self.cookies)
         logger.debug(f"Updated cookies: {set(self._cookies) - set(old_cookies)}")
+        logger.debug(f"Cookie header set: {self._cookie_header}")
 
     def parse_set_cookie(self, response: requests.Response) -> Dict[str, str]:
         """
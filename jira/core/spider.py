@@ -56,9 +56,6 @@ class JiraIssue(BaseModel):
     annex_urls: List[Dict[str, str]] = Field(default_factory=list, description="附件URL列表")
     optimized_content: Optional[str] = Field(None, description="优化后的内容")
 
-    class Config:
-        allow_none = True
-
 
 def extract_value(soup: BeautifulSoup, selector: str, attr: str = None, default: Any = None) -> Any:
     """从BeautifulSoup中提取值的通用函数"""
@@ -3,7 +3,7 @@
 """
 from datetime import datetime
 from typing import Optional, List
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl
 from scrapy import Item, Field as ScrapyField
 
 class HotSearchItem(Item):
@@ -56,12 +56,10 @@ class HotSearchData(BaseModel):
     )
     error: Optional[str] = Field(None, description="错误信息")
 
-    class Config:
-        """Pydantic 配置"""
-        arbitrary_types_allowed = True
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    model_config = ConfigDict(
+        arbitrary_types_allowed=True,
+        json_encoders={datetime: lambda v: v.isoformat()},
+    )
 
     def to_item(self) -> HotSearchItem:
         """转换为 Scrapy Item"""
@@ -13,6 +13,21 @@ from ..items import HotSearchItem, HotSearchData
 
 logger = logging.getLogger(__name__)
 
+# 在页面内一次性提取全部热搜项的标题、链接、热度和标签，
+# 避免逐个元素调用 query_selector/text_content 产生的大量浏览器往返
+EXTRACT_HOT_ITEMS_JS = """
+() => Array.from(document.querySelectorAll('.hotsearch-item')).map(item => {
+    const title = item.querySelector('.title-content');
+    const heat = item.querySelector('.heat-score');
+    return {
+        title: title ? title.textContent : null,
+        href: title ? title.getAttribute('href') : null,
+        heat: heat ? heat.textContent : '0',
+        tags: Array.from(item.querySelectorAll('.tag')).map(tag => tag.textContent),
+    };
+})
+"""
+
 class BaiduSpider(scrapy.Spider):
     """百度热搜爬虫"""
 
@@ -128,8 +143,7 @@ class BaiduSpider(scrapy.Spider):
                         raise Exception(f"热搜内容加载失败: {str(e)}")
 
             # 获取所有热搜项目
-            hot_items = await self._run_with_loop(
-                page.query_selector_all('.hotsearch-item'))
+            hot_items = await self._run_with_loop(page.evaluate(EXTRACT_HOT_ITEMS_JS))
             total_items = len(hot_items)
 
             if not hot_items:
@@ -137,20 +151,15 @@ class BaiduSpider(scrapy.Spider):
 
             logger.info("找到 %d 个热搜项目", total_items)
 
-            for rank, item in enumerate(hot_items, 1):
+            for rank, hot_item in enumerate(hot_items, 1):
                 try:
                     # 提取基本数据
-                    title_elem = await item.query_selector('.title-content')
-                    if not title_elem:
+                    title = hot_item['title']
+                    if title is None:
                         logger.warning("第 %d 项缺少标题元素，跳过", rank)
                         continue
 
-                    # 确保元素可见
-                    await self._run_with_loop(
-                        title_elem.scroll_into_view_if_needed())
-
-                    title = await self._run_with_loop(title_elem.text_content())
-                    url = await self._run_with_loop(title_elem.get_attribute('href'))
+                    url = hot_item['href']
 
                     if not url:
                         logger.warning("第 %d 项缺少URL，跳过: %s", rank, title)
@@ -158,17 +167,10 @@ class BaiduSpider(scrapy.Spider):
 
                     url = urljoin(response.url, url)
                     # 提取热度
-                    heat_elem = await item.query_selector('.heat-score')
-                    heat_score = await heat_elem.text_content() if heat_elem else '0'
-                    heat_score = int(''.join(filter(str.isdigit, heat_score)))
+                    heat_score = int(''.join(filter(str.isdigit, hot_item['heat'] or '0')))
 
                     # 提取标签（可选）
-                    tag_elems = await item.query_selector_all('.tag')
-                    tags = []
-                    for tag_elem in tag_elems:
-                        tag_text = await tag_elem.text_content()
-                        if tag_text:
-                            tags.append(tag_text.strip())
+                    tags = [tag.strip() for tag in hot_item['tags'] if tag]
 
                     # 创建数据项
                     hot_search_data = {
@@ -0,0 +1,76 @@
+"""BearerTokenMiddleware 的白名单匹配与令牌解析测试."""
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from api.middleware.auth import BearerTokenMiddleware
+
+TOKEN = "secret-token"
+
+
+async def _ok(request):
+    return PlainTextResponse("ok")
+
+
+def _client(root_path: str = "") -> TestClient:
+    app = Starlette(routes=[Route("/{path:path}", _ok, methods=["GET", "OPTIONS"])])
+    app.add_middleware(BearerTokenMiddleware, token=TOKEN)
+    return TestClient(app, root_path=root_path)
+
+
+@pytest.mark.parametrize("path", ["/", "/api/docs", "/api/openapi.json", "/api/kms/callback/1"])
+def test_whitelist_paths_skip_auth(path):
+    assert _client().get(path).status_code == 200
+
+
+def test_whitelist_path_under_root_path():
+    client = _client(root_path="/kms")
+    assert client.get("/kms/api/docs").status_code == 200
+    assert client.get("/kms/api/jira/callback/1").status_code == 200
+    assert client.get("/kms/api/jira/tasks").status_code == 401
+
+
+@pytest.mark.parametrize(
+    "path", ["/api/docsX", "/api/openapi.json.bak", "/api/kms/callbackX/1", "/api/commons"]
+)
+def test_prefix_lookalike_requires_auth(path):
+    client = _client()
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"Authorization": f"Bearer {TOKEN}"}).status_code == 200
+
+
+def test_options_skips_auth():
+    assert _client().options("/api/jira/tasks").status_code == 200
+
+
+def test_valid_token():
+    response = _client().get("/api/jira/tasks", headers={"Authorization": f"Bearer {TOKEN}"})
+    assert response.status_code == 200
+
+
+def test_lowercase_scheme():
+    response = _client().get("/api/jira/tasks", headers={"Authorization": f"bearer {TOKEN}"})
+    assert response.status_code == 200
+
+
+def test_missing_header():
+    response = _client().get("/api/jira/tasks")
+    assert response.status_code == 401
+    assert response.json() == {"detail": "缺少认证令牌"}
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+@pytest.mark.parametrize("value", ["Bearer", "Bearer ", f"Basic {TOKEN}", f"Bearer {TOKEN} extra"])
+def test_malformed_header(value):
+    response = _client().get("/api/jira/tasks", headers={"Authorization": value})
+    assert response.status_code == 401
+    assert response.json() == {"detail": "认证令牌格式无效"}
+
+
+def test_wrong_token():
+    response = _client().get("/api/jira/tasks", headers={"Authorization": "Bearer wrong"})
+    assert response.status_code == 401
+    assert response.json() == {"detail": "认证令牌无效"}
@@ -0,0 +1,170 @@
+"""api.database.crud 中任务查询与状态更新的测试，使用内存 SQLite."""
+
+import os
+import subprocess
+import sys
+import time
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from api.database.crud import (
+    complete_task,
+    fail_orphaned_tasks,
+    get_task_by_id,
+    set_task_pid,
+    update_task_status,
+)
+from api.database.models import DifyTask, Task
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def task(db):
+    task = Task(id=uuid4(), task_mode="kms", status="running", start_time=time.time() - 10)
+    db.add(task)
+    db.commit()
+    return task
+
+
+def test_get_task_by_id(db, task):
+    assert get_task_by_id(task.id, "kms", db).id == task.id
+
+
+def test_get_task_by_id_missing(db, task):
+    assert get_task_by_id(uuid4(), "kms", db) is None
+    # 任务模式不同视为不存在
+    assert get_task_by_id(task.id, "jira", db) is None
+
+
+def test_update_task_status(db, task):
+    update_task_status(task, "failed", message="失败", error="boom", db=db, total_issues=3)
+
+    db.expire_all()
+    saved = get_task_by_id(task.id, "kms", db)
+    assert saved.status == "failed"
+    assert saved.message == "失败"
+    assert saved.error == "boom"
+    assert saved.total_issues == 3
+    assert saved.end_time is not None
+    assert saved.duration_seconds == pytest.approx(saved.end_time - saved.start_time)
+
+
+def test_update_task_status_repeated(db, task):
+    update_task_status(task, "completed", message="第一次", db=db)
+    first_end = task.end_time
+    update_task_status(task, "completed", message="第二次", db=db, refresh=True)
+
+    assert task.status == "completed"
+    assert task.message == "第二次"
+    assert task.error is None
+    assert task.end_time >= first_end
+
+
+def test_complete_task(db, task):
+    assert complete_task(task.id, "kms", db)
+
+    db.expire_all()
+    saved = get_task_by_id(task.id, "kms", db)
+    assert saved.status == "completed"
+    assert saved.message == "任务已完成"
+    assert saved.error is None
+    assert saved.duration_seconds == pytest.approx(saved.end_time - saved.start_time)
+
+
+def test_complete_task_missing(db, task):
+    assert not complete_task(uuid4(), "kms", db)
+    assert not complete_task(task.id, "jira", db)
+
+    db.expire_all()
+    assert get_task_by_id(task.id, "kms", db).status == "running"
+
+
+def test_complete_task_repeated_callback(db, task):
+    assert complete_task(task.id, "kms", db)
+    db.expire_all()
+    first_end = get_task_by_id(task.id, "kms", db).end_time
+
+    # 重复回调仍然成功，任务保持完成状态
+    assert complete_task(task.id, "kms", db, message="重复回调")
+    db.expire_all()
+    saved = get_task_by_id(task.id, "kms", db)
+    assert saved.status == "completed"
+    assert saved.message == "重复回调"
+    assert saved.end_time >= first_end
+
+
+def test_complete_task_keeps_failed(db, task):
+    update_task_status(task, "failed", message="爬虫执行失败", db=db)
+
+    # 任务存在但已失败，回调不会把它改回完成
+    assert complete_task(task.id, "kms", db)
+    db.expire_all()
+    saved = get_task_by_id(task.id, "kms", db)
+    assert saved.status == "failed"
+    assert saved.message == "爬虫执行失败"
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_fail_orphaned_tasks(db):
+    start_time = time.time() - 10
+    orphaned = Task(
+        id=uuid4(), status="running", start_time=start_time, extra_data={"owner_pid": _dead_pid()}
+    )
+    legacy = Task(id=uuid4(), status="pending", start_time=start_time)
+    crawler_alive = Task(
+        id=uuid4(),
+        status="running",
+        start_time=start_time,
+        extra_data={"owner_pid": _dead_pid()},
+    )
+    owner_alive = DifyTask(
+        id=uuid4(),
+        status="pending",
+        input_dir="x",
+        dataset_prefix="x",
+        max_docs=1,
+        start_time=start_time,
+        extra_data={"owner_pid": _dead_pid()},
+    )
+    finished = Task(id=uuid4(), status="completed", start_time=start_time)
+    db.add_all([orphaned, legacy, crawler_alive, owner_alive, finished])
+    db.commit()
+    # 子进程仍在运行(用当前进程代替)，或创建任务的 API 进程仍然存在
+    set_task_pid(crawler_alive, os.getpid(), db)
+    owner_alive.extra_data = {"owner_pid": os.getpid()}
+    db.commit()
+
+    assert fail_orphaned_tasks(db, time.time()) == 2
+
+    db.expire_all()
+    assert db.get(Task, orphaned.id).status == "failed"
+    assert db.get(Task, legacy.id).status == "failed"
+    assert db.get(Task, crawler_alive.id).status == "running"
+    assert db.get(DifyTask, owner_alive.id).status == "pending"
+    assert db.get(Task, finished.id).status == "completed"
+
+
+def test_fail_orphaned_tasks_skips_tasks_after_boot(db):
+    task = Task(id=uuid4(), status="pending", start_time=time.time())
+    db.add(task)
+    db.commit()
+
+    assert fail_orphaned_tasks(db, task.start_time - 1) == 0
@@ -0,0 +1,63 @@
+"""Office 附件文本提取测试，与 python-docx / python-pptx 的读取结果对照."""
+
+import io
+
+import pytest
+
+content = pytest.importorskip("crawler.core.content")
+
+_W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def test_docx_only_body_paragraphs():
+    docx = pytest.importorskip("docx")
+    from docx.oxml import parse_xml
+
+    document = docx.Document()
+    document.add_paragraph("第一段\t制表").add_run("续写")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "单元格"
+    paragraph = document.add_paragraph("带文本框：")
+    paragraph._p.append(
+        parse_xml(
+            f"<w:r {_W}><w:pict><w:txbxContent><w:p><w:r><w:t>框内文字</w:t></w:r></w:p>"
+            "</w:txbxContent></w:pict></w:r>"
+        )
+    )
+    paragraph.add_run("尾部")
+    document.add_paragraph("换行").add_run().add_break()
+    document.add_paragraph("")
+    buf = io.BytesIO()
+    document.save(buf)
+    data = buf.getvalue()
+
+    expected = [p.text for p in docx.Document(io.BytesIO(data)).paragraphs]
+    paragraphs = list(content._iter_docx_paragraphs(data))
+    assert paragraphs == expected
+    assert not any("单元格" in p or "框内文字" in p for p in paragraphs)
+
+
+def test_pptx_follows_presentation_order():
+    pptx = pytest.importorskip("pptx")
+    prs = pptx.Presentation()
+    for i in range(12):
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.title.text = f"第{i}页"
+    # 最后一张移到最前，slide12.xml 成为第一张，文件名编号与放映顺序不再一致
+    slide_ids = prs.slides._sldIdLst
+    last = slide_ids[-1]
+    slide_ids.remove(last)
+    slide_ids.insert(0, last)
+    buf = io.BytesIO()
+    prs.save(buf)
+    data = buf.getvalue()
+
+    expected = [
+        shape.text
+        for slide in pptx.Presentation(io.BytesIO(data)).slides
+        for shape in slide.shapes
+        if shape.has_text_frame
+    ]
+    paragraphs = [p for p in content._iter_pptx_paragraphs(data) if p]
+    assert paragraphs == expected
+    assert paragraphs[0] == "第11页"
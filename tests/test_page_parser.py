@@ -0,0 +1,40 @@
+"""Confluence 页面解析测试."""
+
+import pytest
+
+content = pytest.importorskip("crawler.core.content")
+
+PAGE = """
+<html><body>
+<h1 id="title-text"> 示例页面 </h1>
+<div id="main-content">
+  <p>正文</p>
+  <img data-linked-resource-type="attachment" src="/download/attachments/1/a.png">
+  <a data-linked-resource-type="attachment" href="/download/attachments/1/b.pdf">b.pdf</a>
+  <a href="/other">普通链接</a>
+</div>
+</body></html>
+"""
+
+
+def test_parse_page_content():
+    page = content.ContentParser.parse_page_content(PAGE)
+
+    assert page.title == "示例页面"
+    assert "<p>" in page.content_html and "正文" in page.content_html
+    assert page.attachment_links == (
+        "/download/attachments/1/a.png",
+        "/download/attachments/1/b.pdf",
+    )
+
+
+def test_parse_page_content_cached_result_is_immutable():
+    first = content.ContentParser.parse_page_content(PAGE + " ")
+    second = content.ContentParser.parse_page_content(PAGE + " ")
+
+    assert first is second
+    assert all(isinstance(value, (str, tuple)) for value in first)
+
+
+def test_parse_page_content_incomplete():
+    assert content.ContentParser.parse_page_content('<div id="main-content">x</div>') is None
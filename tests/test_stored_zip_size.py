@@ -0,0 +1,83 @@
+"""_stored_zip_size 与实际写出的 ZIP 大小一致性测试."""
+
+import asyncio
+import io
+import zipfile
+from uuid import uuid4
+
+import pytest
+
+from api.utils.index import _scan_dir, _stored_zip_size, create_streaming_zip_response
+from api.utils.zipstream import ZIP_STORED, ZipStreamWriter
+
+
+class _NonSeekable(io.RawIOBase):
+    """只支持写入的流，模拟管道，zipfile 会改用数据描述符."""
+
+    def __init__(self):
+        self.size = 0
+        self.data = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def write(self, b) -> int:
+        self.data += b
+        self.size += len(b)
+        return len(b)
+
+
+@pytest.fixture
+def task_dir(tmp_path):
+    (tmp_path / "readme.txt").write_text("hello")
+    (tmp_path / "空文件.md").write_bytes(b"")
+    sub = tmp_path / "附件" / "子目录"
+    sub.mkdir(parents=True)
+    (sub / "图片.png").write_bytes(bytes(range(256)) * 40)
+    (sub / "data.bin").write_bytes(b"\x00" * 70000)
+    (tmp_path / "empty_dir").mkdir()
+    (tmp_path / "附件" / "空目录").mkdir()
+    return tmp_path
+
+
+def test_matches_zipfile_on_non_seekable_stream(task_dir):
+    entries = _scan_dir(str(task_dir))
+    out = _NonSeekable()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for entry in entries:
+            zf.write(entry.path, arcname=entry.arcname)
+
+    assert any(not entry.arcname.isascii() for entry in entries)
+    assert _stored_zip_size(entries) == out.size
+
+
+def test_matches_zip_stream_writer(task_dir):
+    entries = _scan_dir(str(task_dir))
+    out = _NonSeekable()
+    with ZipStreamWriter(out) as zw:
+        for entry in entries:
+            zw.write_file(
+                entry.path, entry.arcname, entry.mtime_ns / 1e9, entry.mode, entry.size, ZIP_STORED, 0
+            )
+
+    assert _stored_zip_size(entries) == out.size
+    with zipfile.ZipFile(io.BytesIO(bytes(out.data))) as zf:
+        assert zf.testzip() is None
+        assert sorted(zf.namelist()) == sorted(entry.arcname for entry in entries)
+
+
+def test_streaming_response_content_length(task_dir):
+    async def collect():
+        response = await create_streaming_zip_response(
+            str(task_dir), "task.zip", uuid4(), compression=zipfile.ZIP_STORED
+        )
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        return int(response.headers["content-length"]), body
+
+    content_length, body = asyncio.run(collect())
+    assert content_length == len(body)
+    with zipfile.ZipFile(io.BytesIO(body)) as zf:
+        assert zf.testzip() is None